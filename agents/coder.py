@@ -1,5 +1,6 @@
 from tracing.setup_tracer import tracer
-import random
+from assignment import AgentLoad
+from utils.blob_store import set_text_attribute
 
 
 class CoderAgent:
@@ -7,6 +8,7 @@ class CoderAgent:
         self.unique_id = unique_id
         self.model = model
         self.role = "Coder"
+        self.load = AgentLoad()
 
     def step(self, task=None):
         if task is None:
@@ -17,6 +19,7 @@ class CoderAgent:
             task = str(task)
 
         with tracer.start_as_current_span("CoderAgent.step") as span:
+            started = self.load.begin()
             span.set_attribute("agent.id", self.unique_id)
             span.set_attribute("agent.role", self.role)
             span.set_attribute("task.input", task)
@@ -35,9 +38,12 @@ class CoderAgent:
             else:
                 code = self._generate_generic_code(task)
 
-            span.set_attribute("task.output", code)
+            set_text_attribute(span, "task.output", code, self.model.blob_store)
             span.set_attribute("task.status", "completed")
 
+            self.load.complete(started)
+            self.load.annotate(span)
+
             return code
 
 
@@ -47,28 +53,28 @@ class CoderAgent:
             "class UserLogin:\n    def __init__(self):\n        self.oauth_provider = 'google'\n    def login(self, credentials):\n        return oauth.verify(credentials)",
             "async def handle_login(request):\n    token = await get_oauth_token()\n    return {'status': 'logged_in', 'token': token}"
         ]
-        return random.choice(implementations)
+        return self.model.rng.choice(implementations)
 
     def _generate_payment_code(self):
         implementations = [
             "class PaymentProcessor:\n    def charge(self, amount, card):\n        # Stripe integration placeholder\n        return {'status': 'success', 'tx_id': 'ch_123'}",
             "def process_payment(amount, payment_method):\n    if payment_method == 'card':\n        return stripe.create_charge(amount)\n    raise ValueError('Unsupported payment method')"
         ]
-        return random.choice(implementations)
+        return self.model.rng.choice(implementations)
 
     def _generate_profile_code(self):
         implementations = [
             "def create_profile(user_data):\n    profile = Profile.objects.create(**user_data)\n    if 'avatar' in user_data:\n        profile.avatar = process_avatar(user_data['avatar'])\n    profile.save()",
             "class ProfileManager:\n    def upload_avatar(self, file):\n        resized = resize_image(file)\n        return storage.upload(resized)"
         ]
-        return random.choice(implementations)
+        return self.model.rng.choice(implementations)
 
     def _generate_security_code(self):
         implementations = [
             "def fix_vulnerability(vuln_id):\n    patch = SecurityPatch(vuln_id)\n    return patch.apply()",
             "class VulnerabilityScanner:\n    def scan_and_fix(self):\n        issues = scanner.detect()\n        for issue in issues:\n            issue.resolve()\n        return len(issues)"
         ]
-        return random.choice(implementations)
+        return self.model.rng.choice(implementations)
 
     def _generate_generic_code(self, task):
         # Convert task to function name
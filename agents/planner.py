@@ -1,30 +1,38 @@
 from tracing.setup_tracer import tracer
-from openai import OpenAI
-import os
-from dotenv import load_dotenv
-import json
+from llm.client import get_client, record_fallback
+from utils import serialization
+from utils.blob_store import set_text_attribute
 
-load_dotenv()
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# Token budgets for batched planning requests
+BATCH_PROMPT_TOKENS = 6000      # input budget per batch request
+BATCH_COMPLETION_TOKENS = 4000  # max_tokens ceiling per batch request
+TOKENS_PER_WORKFLOW = 150       # expected output tokens for one task's subtasks
 
 
 class PlannerAgent:
-    def __init__(self, unique_id, model):
+    def __init__(self, unique_id, model, llm_client=None):
         self.unique_id = unique_id
         self.model = model
         self.role = "Planner"
+        # Allow injecting a client; otherwise use the shared one
+        self._client = llm_client
+
+    @property
+    def client(self):
+        # Resolved on use, so configure_client() also applies to existing agents
+        return self._client or get_client()
 
     def create_workflow(self, task: str) -> list:
         """Break down task into subtasks using GPT-4-turbo"""
         with tracer.start_as_current_span("Planner.create_workflow") as span:
             span.set_attribute("agent.id", self.unique_id)
             span.set_attribute("agent.role", self.role)
-            span.set_attribute("task.input", task)
+            set_text_attribute(span, "task.input", task, self.model.blob_store)
 
             print(f"Planner {self.unique_id} decomposing task...")
 
             try:
-                response = client.chat.completions.create(
+                response = self.client.chat.completions.create(
                     model="gpt-4o",
                     messages=[
                         {"role": "system",
@@ -38,21 +46,136 @@ class PlannerAgent:
                 )
 
                 content = response.choices[0].message.content
-                workflow = json.loads(content)
+                workflow = serialization.loads(content)
                 subtasks = workflow.get('subtasks', [])
 
                 # Ensure all subtasks are strings
                 subtasks = [str(item) for item in subtasks]
 
-                span.set_attribute("workflow.subtasks", json.dumps(subtasks))
+                span.set_attribute("workflow.subtasks", serialization.dumps(subtasks))
                 print(f"Planner created {len(subtasks)} subtasks")
                 return subtasks
 
             except Exception as e:
                 print(f"Planning failed: {e}")
                 span.record_exception(e)
+                record_fallback("planner", span)
                 return self._fallback_workflow(task)
 
+    def create_workflows(self, tasks: list, batch_size: int = 8, max_retries: int = 1) -> dict:
+        """Decompose many tasks, packing several into each JSON-mode request.
+
+        Returns a map of task index -> subtasks. Tasks missing from a partial
+        response are re-planned in later rounds; anything still missing falls
+        back to _fallback_workflow. A round in which a batch was cut off by the
+        completion limit or failed outright halves the batch size for the next
+        one, since resending the same batch would fail the same way.
+        """
+        tasks = [str(task) for task in tasks]
+        workflows = {}
+        pending = list(range(len(tasks)))
+
+        for attempt in range(max_retries + 1):
+            if not pending:
+                break
+            missing = []
+            shrink = False
+            for batch in self._pack_batches(tasks, pending, batch_size):
+                planned, truncated = self._plan_batch(tasks, batch, attempt)
+                workflows.update(planned)
+                missing.extend(i for i in batch if i not in planned)
+                shrink = shrink or truncated or not planned
+            pending = missing
+            if shrink:
+                batch_size = max(1, batch_size // 2)
+
+        for i in pending:
+            record_fallback("planner_batch")
+            workflows[i] = self._fallback_workflow(tasks[i])
+
+        return workflows
+
+    def _pack_batches(self, tasks, indices, batch_size):
+        """Group task indices into batches that fit the prompt and completion budgets"""
+        max_per_batch = max(1, min(batch_size, BATCH_COMPLETION_TOKENS // TOKENS_PER_WORKFLOW))
+        batch, batch_tokens = [], 0
+        for i in indices:
+            task_tokens = self._estimate_tokens(tasks[i])
+            if batch and (len(batch) >= max_per_batch or batch_tokens + task_tokens > BATCH_PROMPT_TOKENS):
+                yield batch
+                batch, batch_tokens = [], 0
+            batch.append(i)
+            batch_tokens += task_tokens
+        if batch:
+            yield batch
+
+    def _plan_batch(self, tasks, batch, attempt=0) -> tuple:
+        """Plan one batch of tasks with a single request.
+
+        Returns (valid workflows, whether the completion hit max_tokens). Each
+        retry doubles the per-workflow token allowance, up to the ceiling.
+        """
+        with tracer.start_as_current_span("Planner.create_workflow_batch") as span:
+            span.set_attribute("agent.id", self.unique_id)
+            span.set_attribute("agent.role", self.role)
+            span.set_attribute("batch.size", len(batch))
+            span.set_attribute("batch.attempt", attempt)
+
+            print(f"Planner {self.unique_id} decomposing {len(batch)} tasks in one request...")
+
+            task_lines = "\n".join(f"[{i}] {tasks[i]}" for i in batch)
+            max_tokens = min(BATCH_COMPLETION_TOKENS, TOKENS_PER_WORKFLOW * len(batch) * 2 ** attempt)
+            span.set_attribute("batch.max_tokens", max_tokens)
+            truncated = False
+            try:
+                response = self.client.chat.completions.create(
+                    model="gpt-4o",
+                    messages=[
+                        {"role": "system",
+                         "content": "You are a software architect. Break each technical task into 2-4 subtasks as JSON strings."},
+                        {"role": "user",
+                         "content": f"Decompose each of these backend tasks, keyed by the id in brackets:\n{task_lines}\n"
+                                    f"Output JSON format: {{'workflows': {{'<id>': [str]}}}}"}
+                    ],
+                    response_format={"type": "json_object"},
+                    temperature=0.3,
+                    max_tokens=max_tokens
+                )
+
+                choice = response.choices[0]
+                truncated = choice.finish_reason == "length"
+                content = choice.message.content
+                planned = self._parse_batch_response(serialization.loads(content), batch)
+            except Exception as e:
+                print(f"Batch planning failed: {e}")
+                span.record_exception(e)
+                planned = {}
+
+            span.set_attribute("batch.planned", len(planned))
+            span.set_attribute("batch.missing", len(batch) - len(planned))
+            span.set_attribute("batch.truncated", truncated)
+            print(f"Planner created workflows for {len(planned)}/{len(batch)} tasks"
+                  + (" (truncated at max_tokens)" if truncated else ""))
+            return planned, truncated
+
+    def _parse_batch_response(self, payload, batch) -> dict:
+        """Keep only workflows for requested ids that are non-empty lists of subtasks"""
+        workflows = payload.get('workflows', {}) if isinstance(payload, dict) else {}
+        if not isinstance(workflows, dict):
+            return {}
+
+        planned = {}
+        for i in batch:
+            subtasks = workflows.get(str(i))
+            if isinstance(subtasks, list) and subtasks:
+                planned[i] = [str(item) for item in subtasks]
+        return planned
+
+    @staticmethod
+    def _estimate_tokens(text: str) -> int:
+        # Rough heuristic: ~4 characters per token plus per-line overhead
+        return len(text) // 4 + 8
+
     def _fallback_workflow(self, task: str) -> list:
         """Fallback workflow generation"""
         if "authentication" in task.lower():
@@ -60,4 +183,4 @@ class PlannerAgent:
         elif "payment" in task.lower():
             return ["Integrate payment gateway", "Create transaction handling", "Implement reconciliation"]
         else:
-            return [f"Subtask 1 for {task[:20]}", f"Subtask 2 for {task[:20]}"]
\ No newline at end of file
+            return [f"Subtask 1 for {task[:20]}", f"Subtask 2 for {task[:20]}"]
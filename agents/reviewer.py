@@ -1,4 +1,7 @@
 from tracing.setup_tracer import tracer
+from assignment import AgentLoad
+from records import ReviewResult
+from utils.blob_store import set_text_attribute
 
 
 class ReviewerAgent:
@@ -6,6 +9,7 @@ class ReviewerAgent:
         self.unique_id = unique_id
         self.model = model
         self.role = "Reviewer"
+        self.load = AgentLoad()
         # Define patterns that indicate bad/incomplete code
         self.bad_code_patterns = [
             "todo", "pass", "placeholder",
@@ -18,29 +22,30 @@ class ReviewerAgent:
 
         # Create span for reviewing activity
         with tracer.start_as_current_span("ReviewerAgent.step") as span:
+            started = self.load.begin()
             span.set_attribute("agent.id", self.unique_id)
             span.set_attribute("agent.role", self.role)
-            span.set_attribute("code.input", code[:100])  # First 100 chars
+            set_text_attribute(span, "code.input", code, self.model.blob_store, max_inline=100)
 
             print(f"Reviewer {self.unique_id} reviewing code")
 
             # Enhanced error detection logic
             rejection_reason = None
-            result = "Approved"  # Default
+            result = ReviewResult.APPROVED  # Default
 
             # Check 1: Code length (original check)
             if len(code) <= 10:
-                result = "Rejected"
+                result = ReviewResult.REJECTED
                 rejection_reason = "code_too_short"
 
             # Check 2: Bad code patterns
             elif any(pattern in code.lower() for pattern in self.bad_code_patterns):
-                result = "Rejected"
+                result = ReviewResult.REJECTED
                 rejection_reason = "bad_code_pattern"
 
             # Check 3: Placeholder code
             elif "return" not in code and "=" not in code:
-                result = "Rejected"
+                result = ReviewResult.REJECTED
                 rejection_reason = "no_implementation"
 
             # Record results in span
@@ -50,4 +55,7 @@ class ReviewerAgent:
             if rejection_reason:
                 span.set_attribute("rejection.reason", rejection_reason)
 
+            self.load.complete(started)
+            self.load.annotate(span)
+
             return result
\ No newline at end of file
@@ -0,0 +1,384 @@
+"""Critical-path and bottleneck analysis over recorded span trees.
+
+Reads spans exported as SDK ``span.to_json()`` objects (the ``spans.jsonl``
+written under ``--memory-budget``, or ConsoleSpanExporter output), OTLP JSON
+(``resourceSpans``) or Jaeger JSON (``data[].spans``). Spans are held in
+columnar lists with a span-id index and a CSR-style child index, from which
+the analysis computes:
+
+- self time per span (duration minus the union of its children),
+- the critical path of every trace (and of every span with a given name,
+  e.g. each MainTask), walking back from the end through the latest-ending
+  child,
+- wait (LLM calls and pipeline queues) vs compute time, overall and on the
+  critical path,
+- folded stacks for flamegraph.pl / speedscope, and a ranked bottleneck
+  report.
+"""
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from utils import serialization
+from utils.stats import percentile
+import argparse
+import csv
+import json
+import os
+import re
+
+# Spans whose self time is spent waiting on the LLM API or in a pipeline queue rather than computing
+WAIT_SPANS = {"Planner.create_workflow", "Planner.create_workflow_batch", "TaskGeneration", "Pipeline.queue_wait"}
+
+# MainTask.17 -> MainTask.N, so per-task spans aggregate under one name
+_NUMBERED = re.compile(r"\.\d+$")
+
+# Steps shown per path in critical_paths.csv (a whole-run path can have millions)
+MAX_PATH_STEPS = 40
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def normalize_name(name):
+    return _NUMBERED.sub(".N", name)
+
+
+def _iso_to_ns(value):
+    dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    delta = dt - _EPOCH
+    return (delta.days * 86400 + delta.seconds) * 10 ** 9 + delta.microseconds * 1000
+
+
+class SpanTable:
+    """Spans as parallel lists, indexed by span id and by parent"""
+
+    def __init__(self):
+        self.trace = []   # trace number (see trace_ids)
+        self.span_id = []
+        self.parent_id = []
+        self.name = []    # normalized span name
+        self.start = []   # ns since epoch
+        self.end = []
+        self.trace_ids = []
+        self._trace_numbers = {}
+
+    def __len__(self):
+        return len(self.name)
+
+    def add(self, trace_id, span_id, parent_id, name, start_ns, end_ns):
+        number = self._trace_numbers.get(trace_id)
+        if number is None:
+            number = self._trace_numbers[trace_id] = len(self.trace_ids)
+            self.trace_ids.append(trace_id)
+        self.trace.append(number)
+        self.span_id.append(span_id)
+        self.parent_id.append(parent_id or None)
+        self.name.append(normalize_name(name))
+        self.start.append(int(start_ns))
+        self.end.append(int(end_ns))
+
+    def build_index(self):
+        """Resolve parent ids to rows and group children by parent.
+
+        Spans whose parent is missing from the export are treated as roots.
+        """
+        rows = {(t, s): i for i, (t, s) in enumerate(zip(self.trace, self.span_id))}
+        self.parent = [rows.get((t, p), -1) if p is not None else -1
+                       for t, p in zip(self.trace, self.parent_id)]
+        self.roots = [i for i, p in enumerate(self.parent) if p < 0]
+
+        # Children of span i are child_order[child_offsets[i]:child_offsets[i + 1]], by start time
+        counts = [0] * (len(self) + 1)
+        for p in self.parent:
+            if p >= 0:
+                counts[p + 1] += 1
+        for i in range(len(self)):
+            counts[i + 1] += counts[i]
+        self.child_offsets = counts
+        order = sorted((i for i, p in enumerate(self.parent) if p >= 0),
+                       key=lambda i: (self.parent[i], self.start[i]))
+        self.child_order = order
+        return self
+
+    def children(self, i):
+        return self.child_order[self.child_offsets[i]:self.child_offsets[i + 1]]
+
+    def duration(self, i):
+        return self.end[i] - self.start[i]
+
+
+def _add_sdk_span(table, span):
+    context = span["context"]
+    table.add(context["trace_id"], context["span_id"], span.get("parent_id"), span["name"],
+              _iso_to_ns(span["start_time"]), _iso_to_ns(span["end_time"]))
+
+
+def _add_otlp(table, document):
+    for resource_spans in document.get("resourceSpans", []):
+        scopes = resource_spans.get("scopeSpans") or resource_spans.get("instrumentationLibrarySpans", [])
+        for scope in scopes:
+            for span in scope.get("spans", []):
+                table.add(span["traceId"], span["spanId"], span.get("parentSpanId"), span["name"],
+                          span["startTimeUnixNano"], span["endTimeUnixNano"])
+
+
+def _add_jaeger(table, document):
+    for trace_data in document.get("data", []):
+        for span in trace_data.get("spans", []):
+            parent = next((ref["spanID"] for ref in span.get("references", [])
+                           if ref.get("refType") == "CHILD_OF"), None)
+            start = span["startTime"] * 1000  # microseconds
+            table.add(span["traceID"], span["spanID"], parent, span["operationName"],
+                      start, start + span["duration"] * 1000)
+
+
+def _add_document(table, document):
+    if isinstance(document, list):
+        for item in document:
+            _add_document(table, item)
+    elif "resourceSpans" in document:
+        _add_otlp(table, document)
+    elif "data" in document:
+        _add_jaeger(table, document)
+    elif "context" in document:
+        _add_sdk_span(table, document)
+    else:
+        raise ValueError(f"Unrecognized span record with keys {sorted(document)[:5]}")
+
+
+def _iter_documents(path):
+    """JSON documents in a file: one per line, or concatenated/pretty-printed"""
+    with open(path, "rb") as f:
+        first_line = f.readline().strip()
+    try:
+        serialization.loads(first_line)
+        line_delimited = True
+    except ValueError:
+        line_delimited = False
+
+    if line_delimited:
+        yield from serialization.read_lines(path)
+        return
+
+    # Pretty-printed output (e.g. ConsoleSpanExporter): decode objects back to back
+    with open(path) as f:
+        text = f.read()
+    decoder = json.JSONDecoder()
+    position = 0
+    while True:
+        while position < len(text) and text[position] in " \t\r\n,":
+            position += 1
+        if position >= len(text):
+            break
+        document, position = decoder.raw_decode(text, position)
+        yield document
+
+
+def load_spans(path):
+    """Load SDK, OTLP or Jaeger span JSON into an indexed SpanTable"""
+    table = SpanTable()
+    for document in _iter_documents(path):
+        _add_document(table, document)
+    return table.build_index()
+
+
+def self_times(table):
+    """Each span's duration minus the union of its children's intervals"""
+    result = []
+    for i in range(len(table)):
+        start, end = table.start[i], table.end[i]
+        covered = 0
+        covered_until = start
+        for c in table.children(i):  # sorted by start
+            c_start = max(table.start[c], covered_until)
+            c_end = min(table.end[c], end)
+            if c_end > c_start:
+                covered += c_end - c_start
+                covered_until = c_end
+        result.append(max(0, end - start - covered))
+    return result
+
+
+def critical_path(table, root):
+    """Segments (span, start, end) on the critical path below root, latest first.
+
+    From the end of a span, step into the child that finishes last (clipped
+    to the current time), then continue from that child's start; time not
+    covered by a child is the span's own.
+    """
+    segments = []
+    _walk_critical(table, root, table.end[root], segments)
+    return segments
+
+
+def _walk_critical(table, i, limit, segments):
+    start = table.start[i]
+    t = min(table.end[i], limit)
+    for c in sorted(table.children(i), key=lambda c: table.end[c], reverse=True):
+        if t <= start:
+            break
+        if table.start[c] >= t:
+            continue
+        c_end = min(table.end[c], t)
+        if c_end < t:
+            segments.append((i, c_end, t))
+        _walk_critical(table, c, c_end, segments)
+        t = max(table.start[c], start)
+    if t > start:
+        segments.append((i, start, t))
+
+
+def analyze(table, wait_spans=WAIT_SPANS, per_span="MainTask.N"):
+    """Per-name bottleneck rows, per-path rows, folded stacks and totals"""
+    self_time = self_times(table)
+    is_wait = [name in wait_spans for name in table.name]
+
+    durations = defaultdict(list)
+    for i, name in enumerate(table.name):
+        durations[name].append(table.duration(i))
+    self_by_name = Counter()
+    for i, name in enumerate(table.name):
+        self_by_name[name] += self_time[i]
+
+    # Critical paths: every trace root, plus every span named per_span
+    path_roots = list(table.roots)
+    if per_span:
+        path_roots += [i for i, name in enumerate(table.name) if name == per_span and table.parent[i] >= 0]
+    critical_by_name = Counter()
+    path_rows = []
+    for root in path_roots:
+        segments = critical_path(table, root)
+        wait = sum(e - s for i, s, e in segments if is_wait[i])
+        compute = sum(e - s for i, s, e in segments if not is_wait[i])
+        if table.parent[root] < 0:
+            # Aggregate trace-level paths only, so nested per_span paths aren't counted twice
+            for i, s, e in segments:
+                critical_by_name[table.name[i]] += e - s
+        steps = []
+        for i, _, _ in reversed(segments):
+            if not steps or steps[-1] != table.name[i]:
+                steps.append(table.name[i])
+        if len(steps) > MAX_PATH_STEPS:
+            steps = steps[:MAX_PATH_STEPS] + [f"... (+{len(steps) - MAX_PATH_STEPS} steps)"]
+        path_rows.append({
+            "trace_id": table.trace_ids[table.trace[root]],
+            "span_id": table.span_id[root],
+            "span": table.name[root],
+            "duration_ms": table.duration(root) / 1e6,
+            "critical_wait_ms": wait / 1e6,
+            "critical_compute_ms": compute / 1e6,
+            "path": " > ".join(steps),
+        })
+
+    critical_total = sum(critical_by_name.values())
+    bottlenecks = []
+    for name, values in durations.items():
+        values.sort()
+        bottlenecks.append({
+            "span": name,
+            "kind": "wait" if name in wait_spans else "compute",
+            "count": len(values),
+            "total_ms": sum(values) / 1e6,
+            "self_ms": self_by_name[name] / 1e6,
+            "mean_ms": sum(values) / len(values) / 1e6,
+            "p95_ms": percentile(values, 0.95) / 1e6,
+            "critical_ms": critical_by_name[name] / 1e6,
+            "critical_share": critical_by_name[name] / critical_total if critical_total else 0,
+        })
+    bottlenecks.sort(key=lambda row: (row["critical_ms"], row["self_ms"]), reverse=True)
+
+    return {
+        "bottlenecks": bottlenecks,
+        "paths": path_rows,
+        "folded": folded_stacks(table, self_time),
+        "wait_ms": sum(t for t, w in zip(self_time, is_wait) if w) / 1e6,
+        "compute_ms": sum(t for t, w in zip(self_time, is_wait) if not w) / 1e6,
+        "critical_wait_ms": sum(critical_by_name[n] for n in critical_by_name if n in wait_spans) / 1e6,
+        "critical_ms": critical_total / 1e6,
+    }
+
+
+def folded_stacks(table, self_time):
+    """Self time in microseconds per 'root;child;...;leaf' stack"""
+    stacks = [None] * len(table)
+    folded = Counter()
+    pending = list(table.roots)
+    while pending:
+        i = pending.pop()
+        parent = table.parent[i]
+        stacks[i] = table.name[i] if parent < 0 else f"{stacks[parent]};{table.name[i]}"
+        folded[stacks[i]] += self_time[i] // 1000
+        pending.extend(table.children(i))
+    return folded
+
+
+def _write_csv(path, rows):
+    if not rows:
+        return
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def write_report(analysis, output_dir, top=15):
+    os.makedirs(output_dir, exist_ok=True)
+    _write_csv(f"{output_dir}/bottlenecks.csv", analysis["bottlenecks"])
+    _write_csv(f"{output_dir}/critical_paths.csv", analysis["paths"])
+    with open(f"{output_dir}/stacks.folded", "w") as f:
+        for stack, micros in sorted(analysis["folded"].items()):
+            if micros > 0:
+                f.write(f"{stack} {micros}\n")
+
+    total = analysis["wait_ms"] + analysis["compute_ms"]
+    lines = [
+        "CRITICAL PATH & BOTTLENECK REPORT",
+        "=" * 50,
+        f"Traced time: {total:.1f} ms "
+        f"(wait {analysis['wait_ms']:.1f} ms / compute {analysis['compute_ms']:.1f} ms)",
+        f"Critical path: {analysis['critical_ms']:.1f} ms "
+        f"({analysis['critical_wait_ms'] / analysis['critical_ms']:.0%} waiting on the LLM or a queue)"
+        if analysis["critical_ms"] else "Critical path: no spans",
+        "",
+        f"{'span':<32} {'kind':<8} {'count':>7} {'critical_ms':>12} {'share':>6} {'self_ms':>10} {'p95_ms':>9}",
+    ]
+    for row in analysis["bottlenecks"][:top]:
+        lines.append(f"{row['span']:<32} {row['kind']:<8} {row['count']:>7} {row['critical_ms']:>12.1f} "
+                     f"{row['critical_share']:>6.1%} {row['self_ms']:>10.1f} {row['p95_ms']:>9.1f}")
+
+    slowest = sorted(analysis["paths"], key=lambda row: row["duration_ms"], reverse=True)[:5]
+    if slowest:
+        lines += ["", "SLOWEST PATHS:"]
+        for row in slowest:
+            lines.append(f"- {row['span']} {row['duration_ms']:.1f} ms: {row['path']}")
+
+    report = "\n".join(lines) + "\n"
+    with open(f"{output_dir}/bottleneck_report.txt", "w") as f:
+        f.write(report)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Critical-path and bottleneck analysis of exported spans")
+    parser.add_argument("input_file", help="Span export: SDK to_json JSONL, OTLP JSON or Jaeger JSON")
+    parser.add_argument("--output-dir", default=None, help="Defaults to results/critical_path_<timestamp>")
+    parser.add_argument("--wait-span", action="append", default=None,
+                        help="Span name counted as waiting rather than compute (repeatable)")
+    parser.add_argument("--per-span", default="MainTask.N",
+                        help="Also compute a critical path below every span with this (normalized) name")
+    parser.add_argument("--top", type=int, default=15, help="Rows in the bottleneck report")
+    args = parser.parse_args(argv)
+
+    output_dir = args.output_dir or f"results/critical_path_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    print(f"🔍 Loading spans from {args.input_file}")
+    table = load_spans(args.input_file)
+    print(f"  {len(table)} spans in {len(table.trace_ids)} traces")
+
+    wait_spans = set(args.wait_span) if args.wait_span else WAIT_SPANS
+    analysis = analyze(table, wait_spans, args.per_span)
+    print(write_report(analysis, output_dir, args.top))
+    print(f"✅ Reports and stacks.folded saved to {output_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+"""Corpus-wide cross-similarity between generated code and every subtask.
+
+The per-pair similarity in the results only compares a subtask with its own
+code. This analysis embeds every unique subtask and code snippet in a
+results file and compares each code snippet against *all* subtasks, to find
+code that belongs to a different subtask (misrouting or cross-task
+contamination).
+
+Embeddings are unit-length and stored as float16 (or int8), and the
+similarity matrix is computed in blocks with BLAS matmuls. Only the running
+top-k per code snippet is kept, via argpartition, so 100k x 100k corpora
+never materialize the full matrix.
+"""
+from utils.similarity import SimilarityCalculator
+from utils.results_store import read_results
+from utils.blob_store import BlobStore
+from datetime import datetime
+import numpy as np
+import argparse
+import csv
+import os
+
+DEFAULT_BLOCK_SIZE = 4096
+DEFAULT_TOP_K = 5
+# A code snippet is misrouted when another subtask beats its own by more than this
+DEFAULT_MARGIN = 0.05
+INT8_SCALE = 127.0
+EMBEDDING_DTYPES = ("float16", "int8", "float32")
+
+
+class Corpus:
+    """Unique subtask and code texts in a results file, and where each code occurs"""
+
+    def __init__(self):
+        self.subtasks = []      # unique subtask texts
+        self.subtask_refs = []  # "task_id.subtask_id" of each text's first occurrence
+        self.codes = []         # unique code texts
+        self.occurrences = []   # (task_id, subtask_id, subtask index, code index)
+
+
+def load_corpus(path):
+    """Collect unique subtasks and code from plain or compressed results"""
+    corpus = Corpus()
+    subtask_index = {}
+    code_index = {}
+    store = None
+
+    for i, record in enumerate(read_results(path)):
+        if store is None and 'task_ref' in record:
+            store = BlobStore.for_results(path)
+        task_id = record.get('task_id', i + 1)
+
+        for j, subtask in enumerate(record['subtask_results']):
+            text = subtask['subtask']
+            s = subtask_index.get(text)
+            if s is None:
+                s = subtask_index[text] = len(corpus.subtasks)
+                corpus.subtasks.append(text)
+                corpus.subtask_refs.append(f"{task_id}.{j + 1}")
+
+            # Blob-stored code is deduplicated by hash before it is decompressed
+            key = subtask.get('code_ref') or subtask.get('code')
+            c = code_index.get(key)
+            if c is None:
+                c = code_index[key] = len(corpus.codes)
+                corpus.codes.append(store.resolve(subtask, 'code') if store is not None else subtask['code'])
+            corpus.occurrences.append((task_id, j + 1, s, c))
+
+    return corpus
+
+
+def quantize(embeddings, dtype="float16"):
+    """Compact storage for unit-length embeddings"""
+    if dtype == "int8":
+        return np.clip(np.rint(embeddings * INT8_SCALE), -127, 127).astype(np.int8)
+    return embeddings.astype(dtype)
+
+
+def _as_float32(block, dtype):
+    """Widen a stored block for BLAS (there is no int8/float16 sgemm)"""
+    block = block.astype(np.float32)
+    return block / INT8_SCALE if dtype == "int8" else block
+
+
+def embed_corpus(corpus, calculator, dtype="float16", batch_size=256):
+    """(subtask embeddings, code embeddings), cleaned the same way as the per-pair metric"""
+    subtasks = calculator.embed([calculator.clean_task(t) for t in corpus.subtasks], batch_size)
+    codes = calculator.embed([calculator.clean_code(c) for c in corpus.codes], batch_size)
+    return quantize(subtasks, dtype), quantize(codes, dtype)
+
+
+def top_k_similar(queries, keys, k=DEFAULT_TOP_K, block_size=DEFAULT_BLOCK_SIZE, dtype="float16"):
+    """Indices and cosine scores of the k most similar keys for every query, best first.
+
+    Scores are computed one (block_size x block_size) tile at a time; each
+    tile is cut down to its k best columns before merging with the running
+    top-k, so memory stays bounded by one tile.
+    """
+    k = min(k, len(keys))
+    top_idx = np.empty((len(queries), k), dtype=np.int64)
+    top_scores = np.empty((len(queries), k), dtype=np.float32)
+
+    for q0 in range(0, len(queries), block_size):
+        q = _as_float32(queries[q0:q0 + block_size], dtype)
+        best_scores = np.empty((len(q), 0), dtype=np.float32)
+        best_idx = np.empty((len(q), 0), dtype=np.int64)
+
+        for k0 in range(0, len(keys), block_size):
+            scores = q @ _as_float32(keys[k0:k0 + block_size], dtype).T
+            if scores.shape[1] > k:
+                part = np.argpartition(scores, -k, axis=1)[:, -k:]
+                scores = np.take_along_axis(scores, part, axis=1)
+                idx = part + k0
+            else:
+                idx = np.broadcast_to(np.arange(k0, k0 + scores.shape[1]), scores.shape)
+
+            best_scores = np.concatenate([best_scores, scores], axis=1)
+            best_idx = np.concatenate([best_idx, idx], axis=1)
+            if best_scores.shape[1] > k:
+                part = np.argpartition(best_scores, -k, axis=1)[:, -k:]
+                best_scores = np.take_along_axis(best_scores, part, axis=1)
+                best_idx = np.take_along_axis(best_idx, part, axis=1)
+
+        order = np.argsort(-best_scores, axis=1)
+        top_scores[q0:q0 + len(q)] = np.take_along_axis(best_scores, order, axis=1)
+        top_idx[q0:q0 + len(q)] = np.take_along_axis(best_idx, order, axis=1)
+
+    return top_idx, top_scores
+
+
+def own_similarity(subtask_embeddings, code_embeddings, pairs, block_size=DEFAULT_BLOCK_SIZE, dtype="float16"):
+    """Cosine similarity of each (subtask index, code index) pair, computed in chunks"""
+    result = np.empty(len(pairs), dtype=np.float32)
+    for start in range(0, len(pairs), block_size):
+        chunk = pairs[start:start + block_size]
+        subtasks = _as_float32(subtask_embeddings[chunk[:, 0]], dtype)
+        codes = _as_float32(code_embeddings[chunk[:, 1]], dtype)
+        result[start:start + len(chunk)] = np.einsum('ij,ij->i', subtasks, codes)
+    return result
+
+
+def cross_similarity(corpus, subtask_embeddings, code_embeddings, k=DEFAULT_TOP_K,
+                     block_size=DEFAULT_BLOCK_SIZE, dtype="float16", margin=DEFAULT_MARGIN):
+    """One row per code occurrence: own similarity, top-k subtasks and the misrouted flag"""
+    top_idx, top_scores = top_k_similar(code_embeddings, subtask_embeddings, k, block_size, dtype)
+    pairs = np.array([(s, c) for _, _, s, c in corpus.occurrences], dtype=np.int64).reshape(-1, 2)
+    own = own_similarity(subtask_embeddings, code_embeddings, pairs, block_size, dtype)
+
+    rows = []
+    for (task_id, subtask_id, s, c), own_score in zip(corpus.occurrences, own.tolist()):
+        best, best_score = int(top_idx[c, 0]), float(top_scores[c, 0])
+        rows.append({
+            "task_id": task_id,
+            "subtask_id": subtask_id,
+            "subtask": corpus.subtasks[s],
+            "own_similarity": own_score,
+            "best_match": corpus.subtask_refs[best],
+            "best_match_subtask": corpus.subtasks[best],
+            "best_similarity": best_score,
+            "top_k": "|".join(f"{corpus.subtask_refs[j]}:{score:.3f}"
+                              for j, score in zip(top_idx[c].tolist(), top_scores[c].tolist())),
+            "misrouted": best != s and best_score - own_score > margin,
+        })
+    return rows
+
+
+def write_report(corpus, rows, output_dir):
+    os.makedirs(output_dir, exist_ok=True)
+    if rows:
+        with open(f"{output_dir}/cross_similarity.csv", "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+
+    misrouted = [row for row in rows if row["misrouted"]]
+    lines = [
+        "CROSS-SIMILARITY REPORT",
+        "=" * 50,
+        f"Unique subtasks: {len(corpus.subtasks)}",
+        f"Unique code snippets: {len(corpus.codes)}",
+        f"Code occurrences: {len(rows)}",
+    ]
+    if rows:
+        lines += [
+            f"Misrouted: {len(misrouted)} ({len(misrouted) / len(rows):.1%})",
+            f"Average own similarity: {sum(r['own_similarity'] for r in rows) / len(rows):.3f}",
+            f"Average best similarity: {sum(r['best_similarity'] for r in rows) / len(rows):.3f}",
+        ]
+    if misrouted:
+        lines += ["", "LARGEST MISROUTING MARGINS:"]
+        for row in sorted(misrouted, key=lambda r: r["best_similarity"] - r["own_similarity"], reverse=True)[:10]:
+            lines.append(f"- task {row['task_id']}.{row['subtask_id']} ({row['own_similarity']:.2f}) "
+                         f"looks like {row['best_match']} ({row['best_similarity']:.2f}): "
+                         f"{row['best_match_subtask'][:60]}")
+
+    report = "\n".join(lines) + "\n"
+    with open(f"{output_dir}/cross_similarity_summary.txt", "w") as f:
+        f.write(report)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cross-similarity of all code snippets against all subtasks")
+    parser.add_argument("input_file", help="Path to full_results.jsonl[.gz] file")
+    parser.add_argument("--top-k", type=int, default=DEFAULT_TOP_K)
+    parser.add_argument("--block-size", type=int, default=DEFAULT_BLOCK_SIZE,
+                        help="Rows per similarity tile (memory is about 4 * block_size^2 bytes)")
+    parser.add_argument("--dtype", choices=EMBEDDING_DTYPES, default="float16",
+                        help="Storage type for embeddings")
+    parser.add_argument("--margin", type=float, default=DEFAULT_MARGIN,
+                        help="How much another subtask must beat the own subtask to flag misrouting")
+    parser.add_argument("--output-dir", default=None, help="Defaults to results/cross_similarity_<timestamp>")
+    args = parser.parse_args(argv)
+
+    output_dir = args.output_dir or f"results/cross_similarity_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    print(f"🔍 Loading results from {args.input_file}")
+    corpus = load_corpus(args.input_file)
+    print(f"  {len(corpus.subtasks)} unique subtasks, {len(corpus.codes)} unique code snippets")
+
+    print("🧮 Embedding...")
+    subtask_embeddings, code_embeddings = embed_corpus(corpus, SimilarityCalculator(), args.dtype)
+
+    print("📊 Computing blocked cross-similarity...")
+    rows = cross_similarity(corpus, subtask_embeddings, code_embeddings, args.top_k,
+                            args.block_size, args.dtype, args.margin)
+    print(write_report(corpus, rows, output_dir))
+    print(f"✅ Results saved to {output_dir}")
+
+
+if __name__ == "__main__":
+    main()
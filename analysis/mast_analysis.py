@@ -13,7 +13,7 @@ from .visualizations import (
 
 def main():
     parser = argparse.ArgumentParser(description="Run MAST-style analysis on trace data")
-    parser.add_argument("input_file", help="Path to full_results.jsonl file")
+    parser.add_argument("input_file", help="Path to full_results.jsonl[.gz] file")
     args = parser.parse_args()
 
     # Create output directory
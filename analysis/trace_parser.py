@@ -1,46 +1,74 @@
 import pandas as pd
-import json
 import numpy as np
 from collections import defaultdict
 import ast
+from records import code_snippet
+from utils.results_store import read_results
+from utils.blob_store import BlobStore
 
 
-def load_trace_data(file_path):
-    """Load JSONL trace data into a structured DataFrame"""
-    records = []
-    with open(file_path) as f:
-        for line in f:
-            record = json.loads(line)
-
-            # Flatten task-level data
-            task_data = {
-                'task_id': record.get('task_id', None),
-                'main_task': record['task'],
-                'original_task': record['original_task'],
-                'subtask_count': len(record['workflow']),
-                'avg_similarity': record['similarity'],
-                'misalignment_score': 1 - record['similarity'],
-                'total_errors': record['errors'],
-                'error_sources': ', '.join(record['error_sources']),
-                'success_rate': sum(1 for r in record['subtask_results'] if r['result'] == "Approved") /
-                                len(record['subtask_results'])
-            }
-
-            # Process subtasks
-            for i, subtask in enumerate(record['subtask_results']):
-                records.append({
-                    **task_data,
-                    'subtask_id': i + 1,
-                    'subtask': subtask['subtask'],
-                    'code_snippet': subtask['code'][:100] + ('...' if len(subtask['code']) > 100 else ''),
-                    'subtask_result': subtask['result'],
-                    'subtask_similarity': subtask.get('similarity', 0),
-                    'subtask_misalignment': 1 - subtask.get('similarity', 0),
-                    'is_error': 'error' in subtask['subtask'].lower() or
-                                'rejected' in subtask['result'].lower()
-                })
-
-    return pd.DataFrame(records)
+TASK_COLUMNS = [
+    'task_id', 'main_task', 'original_task', 'subtask_count', 'avg_similarity',
+    'misalignment_score', 'total_errors', 'error_sources', 'success_rate'
+]
+
+SUBTASK_COLUMNS = [
+    'subtask_id', 'subtask', 'code_snippet', 'subtask_result',
+    'subtask_similarity', 'subtask_misalignment', 'is_error'
+]
+
+
+def load_trace_data(file_path, task_ids=None):
+    """Load JSONL trace data into a structured DataFrame (one row per subtask).
+
+    Accepts plain or block-compressed results; pass task_ids to load only those tasks.
+    """
+    # Fill columns directly instead of building a merged dict per subtask
+    columns = {name: [] for name in TASK_COLUMNS + SUBTASK_COLUMNS}
+    columns['code_ref'] = []
+    # Text stored as blob hashes is resolved on demand (and cached) from the results' blob store
+    store = None
+
+    for record in read_results(file_path, task_ids):
+        if store is None and 'task_ref' in record:
+            store = BlobStore.for_results(file_path)
+        resolve = store.resolve if store is not None else dict.get
+
+        subtasks = record['subtask_results']
+        n = len(subtasks)
+        if n == 0:
+            continue
+
+        # Task-level data, repeated for each of its subtasks
+        approved = sum(1 for r in subtasks if r['result'] == "Approved")
+        task_values = (
+            record.get('task_id', None),
+            resolve(record, 'task'),
+            resolve(record, 'original_task'),
+            len(record['workflow']),
+            record['similarity'],
+            1 - record['similarity'],
+            record['errors'],
+            ', '.join(record['error_sources']),
+            approved / n
+        )
+        for name, value in zip(TASK_COLUMNS, task_values):
+            columns[name].extend([value] * n)
+
+        # Process subtasks
+        for i, subtask in enumerate(subtasks):
+            similarity = subtask.get('similarity', 0)
+            columns['subtask_id'].append(i + 1)
+            columns['subtask'].append(subtask['subtask'])
+            columns['code_snippet'].append(code_snippet(resolve(subtask, 'code')))
+            columns['code_ref'].append(subtask.get('code_ref'))
+            columns['subtask_result'].append(subtask['result'])
+            columns['subtask_similarity'].append(similarity)
+            columns['subtask_misalignment'].append(1 - similarity)
+            columns['is_error'].append('error' in subtask['subtask'].lower() or
+                                       'rejected' in subtask['result'].lower())
+
+    return pd.DataFrame(columns)
 
 
 def compute_agent_interactions(df):
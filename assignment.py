@@ -0,0 +1,154 @@
+"""Agent assignment policies and per-agent load bookkeeping.
+
+A policy picks which agent of a role gets the next unit of work. Policies
+only see the candidate agents and a callable returning each agent's
+outstanding work, so the same policies drive CodeReviewModel and the
+discrete-event model.
+"""
+import itertools
+import random
+import threading
+import time
+
+
+class AgentLoad:
+    """Outstanding work, busy time and latency of one agent"""
+
+    def __init__(self):
+        self.outstanding = 0
+        self.completed = 0
+        self.busy_time = 0.0
+        self.total_latency = 0.0
+        self.last_latency = 0.0
+        # Utilization is measured from the first piece of work, not from when the
+        # agent was built (which precedes task generation in live runs)
+        self.started = None
+        self._lock = threading.Lock()
+
+    def assigned(self):
+        with self._lock:
+            self.outstanding += 1
+
+    def begin(self):
+        now = time.perf_counter()
+        if self.started is None:
+            self.started = now
+        return now
+
+    def complete(self, started):
+        latency = time.perf_counter() - started
+        with self._lock:
+            # Work handed to an agent directly (not via a policy) was never counted
+            self.outstanding = max(0, self.outstanding - 1)
+            self.completed += 1
+            self.busy_time += latency
+            self.total_latency += latency
+            self.last_latency = latency
+        return latency
+
+    def utilization(self):
+        if self.started is None:
+            return 0
+        elapsed = time.perf_counter() - self.started
+        return self.busy_time / elapsed if elapsed > 0 else 0
+
+    def avg_latency(self):
+        return self.total_latency / self.completed if self.completed else 0
+
+    def annotate(self, span):
+        """Record load and latency attributes on an agent span"""
+        span.set_attribute("agent.outstanding", self.outstanding)
+        span.set_attribute("agent.completed", self.completed)
+        span.set_attribute("agent.utilization", self.utilization())
+        span.set_attribute("agent.latency_ms", self.last_latency * 1000)
+        span.set_attribute("agent.avg_latency_ms", self.avg_latency() * 1000)
+
+
+class AssignmentPolicy:
+    name = "base"
+    # Whether idle agents may take queued work from busy ones
+    steals = False
+
+    def __init__(self, rng=None):
+        self.rng = rng or random
+
+    def select(self, agents, outstanding):
+        raise NotImplementedError
+
+
+class RandomPolicy(AssignmentPolicy):
+    """Uniform random choice (the original behaviour)"""
+    name = "random"
+
+    def select(self, agents, outstanding):
+        return self.rng.choice(agents)
+
+
+class RoundRobinPolicy(AssignmentPolicy):
+    """Cycle through the agents of each role in order"""
+    name = "round_robin"
+
+    def __init__(self, rng=None):
+        super().__init__(rng)
+        self._counters = {}
+
+    def select(self, agents, outstanding):
+        counter = self._counters.setdefault(id(agents), itertools.count())
+        return agents[next(counter) % len(agents)]
+
+
+class LeastOutstandingPolicy(AssignmentPolicy):
+    """Pick the agent with the least outstanding work, breaking ties at random"""
+    name = "least_outstanding"
+
+    def select(self, agents, outstanding):
+        loads = [outstanding(agent) for agent in agents]
+        lowest = min(loads)
+        return self.rng.choice([agent for agent, load in zip(agents, loads) if load == lowest])
+
+
+class PowerOfTwoPolicy(AssignmentPolicy):
+    """Sample two agents at random and pick the less loaded one"""
+    name = "power_of_two"
+
+    def select(self, agents, outstanding):
+        if len(agents) < 2:
+            return agents[0]
+        first, second = self.rng.sample(agents, 2)
+        return first if outstanding(first) <= outstanding(second) else second
+
+
+class WorkStealingPolicy(RoundRobinPolicy):
+    """Place work round-robin on a home agent; idle agents steal from busy ones.
+
+    With per-agent queues (discrete-event model) an agent that runs dry takes
+    the newest job from the longest queue. With synchronous execution there is
+    no queue to steal from, so work whose home agent is busy goes to an idle
+    agent instead.
+    """
+    name = "work_stealing"
+    steals = True
+
+    def select(self, agents, outstanding):
+        home = super().select(agents, outstanding)
+        if outstanding(home) == 0:
+            return home
+        idle = [agent for agent in agents if outstanding(agent) == 0]
+        return self.rng.choice(idle) if idle else home
+
+
+ASSIGNMENT_POLICIES = {
+    policy.name: policy
+    for policy in (RandomPolicy, RoundRobinPolicy, LeastOutstandingPolicy, PowerOfTwoPolicy, WorkStealingPolicy)
+}
+
+
+def make_policy(policy, rng=None):
+    """Build a policy from its name, or return an existing policy instance"""
+    if isinstance(policy, AssignmentPolicy):
+        return policy
+    try:
+        return ASSIGNMENT_POLICIES[policy](rng)
+    except KeyError:
+        raise ValueError(f"Unknown assignment policy {policy!r}; "
+                         f"choose from {', '.join(ASSIGNMENT_POLICIES)}") from None
@@ -0,0 +1,330 @@
+"""Discrete-event simulation of the Planner -> Coder -> Reviewer workflow.
+
+Agents do no real work here: each one has a service-time distribution and a
+FIFO queue, and the simulation advances a virtual clock from event to event.
+This makes it possible to push 100k+ tasks through in seconds of wall time
+and see where queues build up as agent counts change.
+"""
+from assignment import ASSIGNMENT_POLICIES, make_policy
+from utils.stats import percentile
+from collections import deque
+from datetime import datetime
+import argparse
+import csv
+import heapq
+import math
+import os
+import random
+import time
+
+# Event kinds
+ARRIVAL = 0
+SERVICE_DONE = 1
+
+ROLES = ("Planner", "Coder", "Reviewer")
+
+# Default service times in simulated seconds
+DEFAULT_SERVICE_TIMES = {
+    "Planner": "lognormal:4.0:0.5",   # one LLM round trip
+    "Coder": "exp:1.5",
+    "Reviewer": "exp:1.0",
+}
+
+
+def exponential(mean):
+    return lambda rng: rng.expovariate(1.0 / mean)
+
+
+def lognormal(mean, sigma):
+    # Pick mu so the distribution's mean is `mean`
+    mu = math.log(mean) - sigma ** 2 / 2
+    return lambda rng: rng.lognormvariate(mu, sigma)
+
+
+def constant(value):
+    return lambda rng: value
+
+
+def parse_service_time(spec):
+    """Parse 'exp:<mean>', 'lognormal:<mean>:<sigma>' or 'const:<value>'"""
+    kind, *params = spec.split(":")
+    params = [float(p) for p in params]
+    if kind == "exp" and len(params) == 1:
+        return exponential(*params)
+    if kind == "lognormal" and len(params) == 2:
+        return lognormal(*params)
+    if kind == "const" and len(params) == 1:
+        return constant(*params)
+    raise ValueError(f"Invalid service time spec: {spec!r}")
+
+
+class SimAgent:
+    """A simulated agent: one server with its own FIFO queue"""
+
+    __slots__ = ("unique_id", "role", "service_time", "queue", "busy",
+                 "busy_time", "served", "queue_area", "max_queue", "_last_change")
+
+    def __init__(self, unique_id, role, service_time):
+        self.unique_id = unique_id
+        self.role = role
+        self.service_time = service_time
+        self.queue = deque()
+        self.busy = False
+        self.busy_time = 0.0
+        self.served = 0
+        self.queue_area = 0.0  # integral of queue length over time
+        self.max_queue = 0
+        self._last_change = 0.0
+
+    def outstanding(self):
+        return len(self.queue) + self.busy
+
+    def track_queue(self, now):
+        self.queue_area += len(self.queue) * (now - self._last_change)
+        self._last_change = now
+
+
+class DiscreteEventModel:
+    """Event-driven counterpart of CodeReviewModel with simulated time and capacity"""
+
+    def __init__(self, num_coders=2, num_reviewers=1, num_planners=1, service_times=None,
+                 arrival_rate=None, min_subtasks=2, max_subtasks=4, assignment="random", seed=None):
+        self.rng = random.Random(seed)
+        self.assignment = make_policy(assignment, self.rng)
+        self.arrival_rate = arrival_rate
+        self.min_subtasks = min_subtasks
+        self.max_subtasks = max_subtasks
+
+        specs = {**DEFAULT_SERVICE_TIMES, **(service_times or {})}
+        samplers = {role: parse_service_time(spec) if isinstance(spec, str) else spec
+                    for role, spec in specs.items()}
+
+        self.next_id = 0
+        self.agents = {}
+        for role, count in (("Planner", num_planners), ("Coder", num_coders), ("Reviewer", num_reviewers)):
+            self.agents[role] = []
+            for _ in range(count):
+                self.agents[role].append(SimAgent(self.next_id, role, samplers[role]))
+                self.next_id += 1
+
+        self.now = 0.0
+        self._events = []
+        self._seq = 0
+        self.waits = {role: [] for role in ROLES}
+        self.task_latencies = []
+        self.completed_tasks = 0
+
+    def run(self, num_tasks):
+        """Simulate num_tasks tasks to completion; returns the summary report"""
+        started = time.perf_counter()
+
+        # Open workload with Poisson arrivals, or everything queued at t=0
+        arrival = 0.0
+        for task_id in range(num_tasks):
+            if self.arrival_rate:
+                arrival += self.rng.expovariate(self.arrival_rate)
+            self._schedule(arrival, ARRIVAL, task_id)
+
+        events = self._events
+        while events:
+            self.now, _, kind, payload = heapq.heappop(events)
+            if kind == ARRIVAL:
+                # job = [task_id, arrival_time, enqueue_time, subtasks_remaining]
+                self._enqueue("Planner", [payload, self.now, self.now, 0])
+            else:
+                self._finish(*payload)
+
+        report = self.summary()
+        report["wall_time"] = time.perf_counter() - started
+        return report
+
+    def _schedule(self, at, kind, payload):
+        heapq.heappush(self._events, (at, self._seq, kind, payload))
+        self._seq += 1
+
+    def _assign(self, role):
+        return self.assignment.select(self.agents[role], SimAgent.outstanding)
+
+    def _enqueue(self, role, job):
+        agent = self._assign(role)
+        job[2] = self.now
+        if agent.busy:
+            agent.track_queue(self.now)
+            agent.queue.append(job)
+            agent.max_queue = max(agent.max_queue, len(agent.queue))
+        else:
+            self._start(agent, job)
+
+    def _start(self, agent, job):
+        self.waits[agent.role].append(self.now - job[2])
+        service = agent.service_time(self.rng)
+        agent.busy = True
+        agent.busy_time += service
+        self._schedule(self.now + service, SERVICE_DONE, (agent, job))
+
+    def _finish(self, agent, job):
+        agent.busy = False
+        agent.served += 1
+        if agent.queue:
+            agent.track_queue(self.now)
+            self._start(agent, agent.queue.popleft())
+        elif self.assignment.steals:
+            self._steal(agent)
+
+        if agent.role == "Planner":
+            subtasks = self.rng.randint(self.min_subtasks, self.max_subtasks)
+            job[3] = subtasks
+            for _ in range(subtasks):
+                self._enqueue("Coder", [job, None, None, 0])
+        elif agent.role == "Coder":
+            self._enqueue("Reviewer", job)
+        else:
+            # Subtask jobs point back at their parent task job
+            task = job[0]
+            task[3] -= 1
+            if task[3] == 0:
+                self.completed_tasks += 1
+                self.task_latencies.append(self.now - task[1])
+
+    def _steal(self, agent):
+        """Let an idle agent take the newest job from the longest queue of its role"""
+        victim = max(self.agents[agent.role], key=lambda a: len(a.queue))
+        if victim.queue:
+            victim.track_queue(self.now)
+            self._start(agent, victim.queue.pop())
+
+    def role_metrics(self):
+        """Per-role utilization, queue lengths and wait times"""
+        horizon = self.now or 1.0
+        rows = []
+        for role in ROLES:
+            agents = self.agents[role]
+            for agent in agents:
+                agent.track_queue(self.now)
+            waits = sorted(self.waits[role])
+            rows.append({
+                "role": role,
+                "agents": len(agents),
+                "served": sum(a.served for a in agents),
+                "utilization": sum(a.busy_time for a in agents) / (len(agents) * horizon) if agents else 0,
+                "avg_queue_length": sum(a.queue_area for a in agents) / horizon,
+                "max_queue_length": max((a.max_queue for a in agents), default=0),
+                "avg_wait": sum(waits) / len(waits) if waits else 0,
+                "p95_wait": percentile(waits, 0.95),
+                "p99_wait": percentile(waits, 0.99),
+            })
+        return rows
+
+    def summary(self):
+        latencies = sorted(self.task_latencies)
+        return {
+            "completed_tasks": self.completed_tasks,
+            "makespan": self.now,
+            "throughput": self.completed_tasks / self.now if self.now else 0,
+            "p50_latency": percentile(latencies, 0.50),
+            "p95_latency": percentile(latencies, 0.95),
+            "p99_latency": percentile(latencies, 0.99),
+            "roles": self.role_metrics(),
+        }
+
+
+def service_times_from_args(args):
+    return {
+        "Planner": args.planner_time,
+        "Coder": args.coder_time,
+        "Reviewer": args.reviewer_time,
+    }
+
+
+def compare_policies(args, service_times):
+    """Run the same seeded workload under every assignment policy and compare tail latency"""
+    for num_reviewers in args.reviewers:
+        print(f"\n🏁 Comparing assignment policies: {args.planners} planner(s), {args.coders} coder(s), "
+              f"{num_reviewers} reviewer(s), {args.tasks} tasks")
+        print(f"   {'policy':<18} {'p50':>8} {'p95':>8} {'p99':>8} {'coder p99 wait':>15} {'reviewer p99 wait':>18}")
+
+        for name in ASSIGNMENT_POLICIES:
+            model = DiscreteEventModel(
+                num_coders=args.coders,
+                num_reviewers=num_reviewers,
+                num_planners=args.planners,
+                service_times=service_times,
+                arrival_rate=args.arrival_rate,
+                assignment=name,
+                seed=args.seed
+            )
+            report = model.run(args.tasks)
+            roles = {role["role"]: role for role in report["roles"]}
+            print(f"   {name:<18} {report['p50_latency']:>8.1f} {report['p95_latency']:>8.1f} "
+                  f"{report['p99_latency']:>8.1f} {roles['Coder']['p99_wait']:>15.1f} "
+                  f"{roles['Reviewer']['p99_wait']:>18.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Discrete-event capacity simulation of the agent workflow")
+    parser.add_argument("--tasks", type=int, default=100000)
+    parser.add_argument("--planners", type=int, default=1)
+    parser.add_argument("--coders", type=int, default=2)
+    parser.add_argument("--reviewers", type=int, nargs="+", default=[1],
+                        help="One or more reviewer counts to compare")
+    parser.add_argument("--arrival-rate", type=float, default=None,
+                        help="Task arrivals per simulated second (default: all tasks queued at t=0)")
+    parser.add_argument("--planner-time", default=DEFAULT_SERVICE_TIMES["Planner"])
+    parser.add_argument("--coder-time", default=DEFAULT_SERVICE_TIMES["Coder"])
+    parser.add_argument("--reviewer-time", default=DEFAULT_SERVICE_TIMES["Reviewer"])
+    parser.add_argument("--assignment", default="random", choices=list(ASSIGNMENT_POLICIES))
+    parser.add_argument("--compare-policies", action="store_true",
+                        help="Benchmark tail latency of every assignment policy on the same workload")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    if args.compare_policies:
+        compare_policies(args, service_times_from_args(args))
+        return
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    output_dir = f"results/discrete_event_{timestamp}"
+    os.makedirs(output_dir, exist_ok=True)
+
+    service_times = service_times_from_args(args)
+
+    rows = []
+    for num_reviewers in args.reviewers:
+        model = DiscreteEventModel(
+            num_coders=args.coders,
+            num_reviewers=num_reviewers,
+            num_planners=args.planners,
+            service_times=service_times,
+            arrival_rate=args.arrival_rate,
+            assignment=args.assignment,
+            seed=args.seed
+        )
+        report = model.run(args.tasks)
+
+        print(f"\n⚙️  {args.planners} planner(s), {args.coders} coder(s), {num_reviewers} reviewer(s)")
+        print(f"   Simulated {report['completed_tasks']} tasks in {report['wall_time']:.2f}s wall time")
+        print(f"   Throughput: {report['throughput']:.3f} tasks/s   "
+              f"Latency p50/p95/p99: {report['p50_latency']:.1f}/{report['p95_latency']:.1f}/"
+              f"{report['p99_latency']:.1f}s")
+        for role in report["roles"]:
+            print(f"   {role['role']:<9} util={role['utilization']:.0%} avg_queue={role['avg_queue_length']:.1f} "
+                  f"avg_wait={role['avg_wait']:.1f}s p95_wait={role['p95_wait']:.1f}s")
+            rows.append({
+                "planners": args.planners,
+                "coders": args.coders,
+                "reviewers": num_reviewers,
+                "throughput": report["throughput"],
+                "p95_latency": report["p95_latency"],
+                **role
+            })
+
+    with open(f"{output_dir}/role_metrics.csv", "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+    print(f"\n💾 Role metrics saved to: {output_dir}/role_metrics.csv")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Shared OpenAI client, created on first use.
+
+Importing the agents no longer needs an API key, and the endpoint can be
+pointed at any OpenAI-compatible server (e.g. llm.stub_server) through
+configure_client() or the OPENAI_BASE_URL environment variable.
+
+Callers that swallow API errors and fall back to canned output report it
+with record_fallback(), so drivers such as loadtest can see, per task, which
+LLM calls gave up (track_fallbacks()).
+"""
+from openai import OpenAI
+from dotenv import load_dotenv
+import contextlib
+import contextvars
+import os
+import threading
+
+load_dotenv()
+
+_client = None
+_options = {}
+_lock = threading.Lock()
+# Stages that fell back in the current context; None when nobody is tracking
+_fallbacks = contextvars.ContextVar("llm_fallbacks", default=None)
+
+
+def configure_client(base_url=None, api_key=None, max_retries=None, timeout=None):
+    """Set options for the shared client; it is rebuilt on next use"""
+    global _client
+    options = {"base_url": base_url, "api_key": api_key, "max_retries": max_retries, "timeout": timeout}
+    with _lock:
+        _options.update({k: v for k, v in options.items() if v is not None})
+        # Local servers don't check keys, but the SDK insists on one
+        if base_url and "api_key" not in _options and not os.getenv("OPENAI_API_KEY"):
+            _options["api_key"] = "local"
+        _client = None
+
+
+def get_client():
+    global _client
+    with _lock:
+        if _client is None:
+            options = {"api_key": os.getenv("OPENAI_API_KEY"), "base_url": os.getenv("OPENAI_BASE_URL")}
+            options.update(_options)
+            _client = OpenAI(**{k: v for k, v in options.items() if v is not None})
+        return _client
+
+
+def record_fallback(stage, span=None):
+    """Note that an LLM call gave up and canned output was used instead"""
+    if span is not None:
+        span.set_attribute("llm.fallback", True)
+        span.set_attribute("llm.fallback_stage", stage)
+    fallbacks = _fallbacks.get()
+    if fallbacks is not None:
+        fallbacks.append(stage)
+
+
+@contextlib.contextmanager
+def track_fallbacks():
+    """Collect the stages that fall back inside this block (in this thread only)"""
+    fallbacks = []
+    token = _fallbacks.set(fallbacks)
+    try:
+        yield fallbacks
+    finally:
+        _fallbacks.reset(token)
@@ -0,0 +1,282 @@
+"""Local OpenAI-compatible chat-completions server for load tests.
+
+Answers POST /v1/chat/completions with canned but well-formed responses for
+the three request shapes the simulation sends: task generation, single-task
+planning ({'subtasks': [...]}) and batch planning ({'workflows': {...}}).
+Latency follows a configurable distribution (the same specs as
+discrete_event), and a share of requests fail with 500s or are rate-limited
+with 429s (a token bucket plus an optional random rate), so client retry
+behaviour can be measured. GET /stats returns request counters and latency
+percentiles.
+"""
+from discrete_event import parse_service_time
+from llm.synthetic_tasks import SyntheticTaskGenerator, KEYWORDS
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from utils import serialization
+from utils.stats import percentile
+from collections import Counter
+import argparse
+import random
+import re
+import threading
+import time
+import zlib
+
+DEFAULT_LATENCY = "lognormal:0.8:0.5"
+
+SUBTASK_STEPS = [
+    "Design the {area} data model",
+    "Implement the {area} service logic",
+    "Add {area} input validation and error handling",
+    "Expose the {area} API endpoints",
+    "Write {area} integration tests",
+]
+
+_TASK_LINE = re.compile(r"^\[(\d+)\] (.*)$", re.MULTILINE)
+
+
+class TokenBucket:
+    """Admit up to `rate` requests per second with bursts of `burst`"""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def take(self):
+        """Take a token; returns 0 on success or the seconds until one is available"""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+
+class StubBehaviour:
+    """Latency, failures and response content shared by all handler threads"""
+
+    def __init__(self, latency=DEFAULT_LATENCY, error_rate=0.0, rate_limit=None, burst=None,
+                 throttle_rate=0.0, seed=None):
+        self.latency = parse_service_time(latency)
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.bucket = TokenBucket(rate_limit, burst) if rate_limit else None
+        self.rng = random.Random(seed)
+        self.tasks = SyntheticTaskGenerator(seed=seed)
+        self._lock = threading.Lock()
+
+        self.status = Counter()
+        self.kinds = Counter()
+        self.retried = 0
+        self.latencies = []
+        self.first_request = None
+        self.last_request = None
+
+    def draw(self):
+        """(latency, failure) for one request; failure is None, 'error' or 'throttle'"""
+        with self._lock:
+            latency = self.latency(self.rng)
+            roll = self.rng.random()
+        if roll < self.error_rate:
+            return latency, "error"
+        if roll < self.error_rate + self.throttle_rate:
+            return latency, "throttle"
+        return latency, None
+
+    def record(self, status, kind, latency, retry_count):
+        now = time.monotonic()
+        with self._lock:
+            if self.first_request is None:
+                self.first_request = now - latency
+            self.last_request = now
+            self.status[status] += 1
+            self.kinds[kind] += 1
+            self.latencies.append(latency)
+            if retry_count:
+                self.retried += 1
+
+    def respond(self, messages):
+        """(kind, content) for a chat request"""
+        prompt = messages[-1].get("content", "") if messages else ""
+        if "'workflows'" in prompt:
+            workflows = {i: self._subtasks(task) for i, task in _TASK_LINE.findall(prompt)}
+            return "batch_plan", serialization.dumps({"workflows": workflows})
+        if "'subtasks'" in prompt:
+            task = prompt.split("\n")[0].removeprefix("Decompose this backend task: ")
+            return "plan", serialization.dumps({"subtasks": self._subtasks(task)})
+        with self._lock:
+            return "generate", self.tasks.generate_task()
+
+    @staticmethod
+    def _subtasks(task):
+        # Deterministic per task, and carrying the task's keyword so coders branch as they would
+        rng = random.Random(zlib.crc32(task.encode()))
+        lowered = task.lower()
+        area = next((k for k in KEYWORDS if k and k in lowered), "feature")
+        steps = rng.sample(SUBTASK_STEPS, rng.randint(2, 4))
+        return [step.format(area=area) for step in steps]
+
+    def stats(self):
+        with self._lock:
+            latencies = sorted(self.latencies)
+            elapsed = self.last_request - self.first_request if self.latencies else 0.0
+            return {
+                "requests": sum(self.status.values()),
+                "status": {str(k): v for k, v in self.status.items()},
+                "kinds": dict(self.kinds),
+                "retried_requests": self.retried,
+                "requests_per_second": len(latencies) / elapsed if elapsed else 0.0,
+                "latency_p50": percentile(latencies, 0.50),
+                "latency_p95": percentile(latencies, 0.95),
+                "latency_p99": percentile(latencies, 0.99),
+            }
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/stats":
+            self._send_json(200, self.server.behaviour.stats())
+        else:
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}", "type": "invalid_request_error"}})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length)
+        if self.path.rstrip("/") != "/v1/chat/completions":
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}", "type": "invalid_request_error"}})
+            return
+
+        behaviour = self.server.behaviour
+        # The OpenAI SDK numbers its retries in this header
+        retry_count = int(self.headers.get("x-stainless-retry-count", 0) or 0)
+        started = time.perf_counter()
+
+        if behaviour.bucket is not None:
+            wait = behaviour.bucket.take()
+            if wait:
+                self._rate_limited(wait, retry_count, started)
+                return
+
+        latency, failure = behaviour.draw()
+        time.sleep(latency)
+        if failure == "throttle":
+            self._rate_limited(1.0, retry_count, started)
+            return
+        if failure == "error":
+            behaviour.record(500, "error", time.perf_counter() - started, retry_count)
+            self._send_json(500, {"error": {"message": "Stub server error", "type": "server_error"}})
+            return
+
+        request = serialization.loads(body)
+        kind, content = behaviour.respond(request.get("messages", []))
+        prompt_tokens = len(body) // 4
+        completion_tokens = len(content) // 4
+        behaviour.record(200, kind, time.perf_counter() - started, retry_count)
+        self._send_json(200, {
+            "id": f"chatcmpl-stub-{behaviour.rng.getrandbits(48):012x}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "stub"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        })
+
+    def _rate_limited(self, retry_after, retry_count, started):
+        self.server.behaviour.record(429, "rate_limited", time.perf_counter() - started, retry_count)
+        self._send_json(429, {"error": {"message": "Rate limit reached", "type": "rate_limit_error"}},
+                        {"retry-after-ms": str(int(retry_after * 1000))})
+
+    def _send_json(self, status, payload, headers=None):
+        data = serialization.dumps_bytes(payload)
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class StubServer(ThreadingHTTPServer):
+    """Threaded stub server; use start()/stop() to run it in the background"""
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=0, behaviour=None, verbose=False):
+        super().__init__((host, port), StubHandler)
+        self.behaviour = behaviour or StubBehaviour()
+        self.verbose = verbose
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, name="stub-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+
+def add_behaviour_args(parser):
+    parser.add_argument("--latency", default=DEFAULT_LATENCY,
+                        help="Response latency in seconds: exp:<mean>, lognormal:<mean>:<sigma> or const:<v>")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with a 500")
+    parser.add_argument("--rate-limit", type=float, default=None,
+                        help="Requests per second admitted before answering 429")
+    parser.add_argument("--burst", type=float, default=None, help="Token bucket burst size (default: rate limit)")
+    parser.add_argument("--throttle-rate", type=float, default=0.0,
+                        help="Share of requests answered with a 429 regardless of rate")
+    parser.add_argument("--stub-seed", type=int, default=None, help="Seed for latencies, failures and content")
+
+
+def behaviour_from_args(args):
+    return StubBehaviour(args.latency, args.error_rate, args.rate_limit, args.burst,
+                         args.throttle_rate, args.stub_seed)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local OpenAI-compatible stub server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--verbose", action="store_true", help="Log every request")
+    add_behaviour_args(parser)
+    args = parser.parse_args(argv)
+
+    server = StubServer(args.host, args.port, behaviour_from_args(args), args.verbose)
+    print(f"🧪 Stub server listening on {server.base_url} (stats at /stats)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+"""Seeded, template-based backend feature requests for offline runs.
+
+Tasks are assembled from a small grammar around the TaskGenerator task
+types. Each task carries at most one of the keywords CoderAgent.step
+branches on (login/payment/profile/security), drawn from a configurable
+distribution, and optionally one of the ambiguity phrases the model
+detects. Generation is lazy, so streams of millions of tasks cost no more
+memory than one.
+
+With the default task types the grammar yields about 1.3 billion distinct
+tasks (cardinality() gives the exact figure), so a stream of millions is
+almost free of repeats that would skew similarity and cache statistics.
+"""
+from llm.task_types import TASK_TYPES
+from utils.ambiguity import AMBIGUOUS_PHRASES
+import bisect
+import itertools
+import random
+
+# Keywords that select a code generator in CoderAgent.step (None = generic code)
+KEYWORDS = ("login", "payment", "profile", "security", None)
+
+DEFAULT_KEYWORD_WEIGHTS = {
+    "login": 0.15,
+    "payment": 0.15,
+    "profile": 0.15,
+    "security": 0.15,
+    None: 0.40,
+}
+
+# Clauses that put exactly one keyword into a task
+KEYWORD_CLAUSES = {
+    "login": [
+        "covering the login flow",
+        "with login throttling after repeated failures",
+        "including single sign-on login via OAuth2",
+        "that records every login attempt",
+        "with passwordless login links",
+        "that locks accounts after suspicious login activity",
+        "supporting login with hardware keys",
+        "with remember-me login sessions",
+    ],
+    "payment": [
+        "for recurring payment collection",
+        "with idempotent payment retries",
+        "that reconciles payment webhooks nightly",
+        "supporting partial payment refunds",
+        "with payment status notifications",
+        "that splits a payment across several methods",
+        "with fraud checks before payment capture",
+        "supporting payment in multiple currencies",
+    ],
+    "profile": [
+        "for editable profile settings",
+        "with profile picture resizing",
+        "that exposes public profile pages",
+        "supporting profile data export",
+        "with profile completeness tracking",
+        "that merges duplicate profile records",
+        "with per-field profile visibility",
+        "that audits every profile change",
+    ],
+    "security": [
+        "with security headers on every response",
+        "that logs security-relevant events",
+        "including security scanning in CI",
+        "with security review of stored secrets",
+        "with security alerts for on-call admins",
+        "that enforces security policies per tenant",
+        "with security patches rolled out automatically",
+        "with a security incident runbook",
+    ],
+    None: [
+        "used by the admin dashboard",
+        "behind the public REST gateway",
+        "consumed by the mobile client",
+        "shared by the reporting jobs",
+        "exposed to partner integrations",
+        "running as a nightly batch job",
+        "with a versioned public contract",
+        "with multi-tenant isolation",
+    ],
+}
+
+VERBS = [
+    "Implement", "Build", "Add", "Design", "Create", "Extend",
+    "Refactor", "Develop", "Ship", "Rework", "Prototype", "Harden",
+]
+
+TECHNOLOGIES = [
+    "a PostgreSQL", "a Redis", "a Kafka", "a RabbitMQ", "a gRPC", "a GraphQL",
+    "an S3", "a DynamoDB", "a Celery", "an Elasticsearch", "a FastAPI", "a Django",
+    "a MongoDB", "a Cassandra", "a ClickHouse", "a NATS", "a Flask", "a Spring Boot",
+    "an SQS", "a Memcached",
+]
+
+# Systems a task is built for
+ENTITIES = [
+    "the orders service", "the inventory service", "the billing platform", "the customer portal",
+    "the search service", "the shipping service", "the analytics pipeline", "the catalog service",
+    "the messaging platform", "the scheduling service", "the support desk", "the partner API",
+    "the warehouse system", "the subscription platform", "the content service", "the onboarding flow",
+]
+
+REQUIREMENTS = [
+    "p99 latency under 200ms",
+    "horizontal scaling across three regions",
+    "an audit trail for every write",
+    "rate limiting per API key",
+    "zero-downtime schema migrations",
+    "structured logging with trace IDs",
+    "input validation with clear error codes",
+    "retry with exponential backoff",
+    "encryption of data at rest",
+    "feature-flagged rollout",
+    "automated integration tests",
+    "caching with explicit invalidation",
+    "idempotent request handling",
+    "graceful degradation when dependencies fail",
+    "pagination on every list endpoint",
+    "OpenAPI documentation",
+    "backward-compatible API versioning",
+    "metrics exported to Prometheus",
+    "a documented rollback plan",
+    "load tests at twice peak traffic",
+]
+
+# Sentence shapes, filled in order: verb, technology, task type, entity, clause, two requirements
+PHRASINGS = [
+    "%s %s-backed %s for %s %s. Requirements: %s and %s",
+    "%s %s-backed %s, owned by %s, %s. It must provide %s and %s",
+    "%s %s-backed %s in %s %s. Constraints: %s; %s",
+    "%s %s-backed %s for %s, %s. Needs %s and %s",
+]
+
+
+def _task_type_keyword(task_type):
+    """The CoderAgent keyword a task type already contains, if any"""
+    lowered = task_type.lower()
+    return next((k for k in KEYWORDS if k and k in lowered), None)
+
+
+class SyntheticTaskGenerator:
+    """Drop-in offline replacement for TaskGenerator"""
+
+    def __init__(self, seed=None, keyword_weights=None, ambiguity_rate=0.0, task_types=None):
+        self.rng = random.Random(seed)
+        self.ambiguity_rate = ambiguity_rate
+
+        weights = keyword_weights or DEFAULT_KEYWORD_WEIGHTS
+        self.keywords = [k for k in KEYWORDS if weights.get(k, 0) > 0]
+        self.cum_weights = list(itertools.accumulate(weights[k] for k in self.keywords))
+
+        # Only pair a keyword with task types that don't already carry a different one
+        task_types = task_types or TASK_TYPES
+        self.types_by_keyword = {}
+        for keyword in self.keywords:
+            compatible = [t for t in task_types if _task_type_keyword(t) in (None, keyword)]
+            if not compatible:
+                raise ValueError(f"No task type can carry keyword {keyword!r}")
+            self.types_by_keyword[keyword] = compatible
+
+    def generate_task(self, temperature=None) -> str:
+        """Generate one task (temperature is accepted for TaskGenerator compatibility)"""
+        # Index with random() directly; much cheaper than rng.choice/rng.sample per field
+        rnd = self.rng.random
+        keyword = self.keywords[bisect.bisect(self.cum_weights, rnd() * self.cum_weights[-1])]
+        task_types = self.types_by_keyword[keyword]
+        clauses = KEYWORD_CLAUSES[keyword]
+
+        # Two distinct requirements
+        first = int(rnd() * len(REQUIREMENTS))
+        second = int(rnd() * (len(REQUIREMENTS) - 1))
+        if second >= first:
+            second += 1
+
+        task = PHRASINGS[int(rnd() * len(PHRASINGS))] % (
+            VERBS[int(rnd() * len(VERBS))],
+            TECHNOLOGIES[int(rnd() * len(TECHNOLOGIES))],
+            task_types[int(rnd() * len(task_types))],
+            ENTITIES[int(rnd() * len(ENTITIES))],
+            clauses[int(rnd() * len(clauses))],
+            REQUIREMENTS[first],
+            REQUIREMENTS[second],
+        )
+        if self.ambiguity_rate and rnd() < self.ambiguity_rate:
+            return f"{task} {AMBIGUOUS_PHRASES[int(rnd() * len(AMBIGUOUS_PHRASES))]}."
+        return f"{task}."
+
+    def cardinality(self) -> int:
+        """Number of distinct tasks this generator can produce"""
+        shared = (len(PHRASINGS) * len(VERBS) * len(TECHNOLOGIES) * len(ENTITIES)
+                  * len(REQUIREMENTS) * (len(REQUIREMENTS) - 1))
+        per_keyword = sum(len(self.types_by_keyword[k]) * len(KEYWORD_CLAUSES[k]) for k in self.keywords)
+        variants = 1 + len(AMBIGUOUS_PHRASES) if self.ambiguity_rate else 1
+        return shared * per_keyword * variants
+
+    def stream(self, num_tasks=None):
+        """Lazily yield num_tasks tasks, or an endless stream if num_tasks is None"""
+        counter = itertools.count() if num_tasks is None else range(num_tasks)
+        generate = self.generate_task
+        for _ in counter:
+            yield generate()
+
+
+if __name__ == "__main__":
+    # Usage: python -m llm.synthetic_tasks [num_tasks]
+    import sys
+    import time
+    from collections import Counter
+
+    num_tasks = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    generator = SyntheticTaskGenerator(seed=42, ambiguity_rate=0.2)
+
+    start = time.perf_counter()
+    for _ in generator.stream(num_tasks):
+        pass
+    duration = time.perf_counter() - start
+    print(f"Generated {num_tasks} tasks in {duration:.2f}s ({num_tasks / duration:,.0f} tasks/s)")
+
+    # Check the keyword and ambiguity mix on a sample
+    sample_size = min(num_tasks, 100000)
+    keywords = Counter()
+    ambiguous = 0
+    for task in generator.stream(sample_size):
+        lowered = task.lower()
+        keywords[next((k for k in KEYWORDS if k and k in lowered), None)] += 1
+        ambiguous += any(phrase in task for phrase in AMBIGUOUS_PHRASES)
+
+    for keyword, count in keywords.most_common():
+        print(f"  {keyword or 'generic'}: {count / sample_size:.1%}")
+    print(f"  ambiguous: {ambiguous / sample_size:.1%}")
+    print(f"Distinct tasks possible: {generator.cardinality():,}")
+    print(f"Example: {generator.generate_task()}")
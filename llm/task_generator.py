@@ -1,29 +1,19 @@
-import os
-from openai import OpenAI
-from dotenv import load_dotenv
+from llm.client import get_client, record_fallback
+from llm.task_types import TASK_TYPES
+from opentelemetry import trace
 import random
 
-load_dotenv()
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-
 
 class TaskGenerator:
-    def __init__(self, model="gpt-4o"):
+    def __init__(self, model="gpt-4o", llm_client=None):
         self.model = model
-        self.task_types = [
-            "authentication system",
-            "payment processing",
-            "user profile management",
-            "data storage solution",
-            "API endpoint",
-            "security feature",
-            "notification service",
-            "performance optimization"
-        ]
+        self.task_types = list(TASK_TYPES)
+        self.llm_client = llm_client
 
     def generate_task(self, temperature=0.7) -> str:
         """Generate a backend feature request using LLM"""
         try:
+            client = self.llm_client or get_client()
             response = client.chat.completions.create(
                 model=self.model,
                 messages=[
@@ -38,6 +28,7 @@ class TaskGenerator:
             return response.choices[0].message.content.strip()
         except Exception as e:
             print(f"LLM Error: {e}")
+            record_fallback("task_generation", trace.get_current_span())
             return self._manual_task_generation()
 
 
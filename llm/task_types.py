@@ -0,0 +1,11 @@
+# Backend feature areas tasks are generated for
+TASK_TYPES = [
+    "authentication system",
+    "payment processing",
+    "user profile management",
+    "data storage solution",
+    "API endpoint",
+    "security feature",
+    "notification service",
+    "performance optimization"
+]
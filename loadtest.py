@@ -0,0 +1,216 @@
+"""Load test the simulation against an OpenAI-compatible endpoint.
+
+Starts the local stub server (unless --base-url points elsewhere), routes the
+shared LLM client to it and submits tasks at a target rate. Arrivals are
+open-loop: a task is submitted on schedule whether or not earlier ones have
+finished, and its latency is measured from the scheduled arrival, so
+queueing delay is counted. Each task generates its text through the LLM and
+runs model.run_task on a worker pool. The agents fall back to canned output
+when an LLM call fails, so a task that finishes can still be degraded: tasks
+are counted as completed, degraded (some stage fell back) or failed (raised).
+The report covers throughput, task latency percentiles, LLM give-ups and the
+stub's request counts, 429s, 500s and client retries.
+"""
+from model import CodeReviewModel
+from assignment import ASSIGNMENT_POLICIES
+from llm.client import configure_client, track_fallbacks
+from llm.stub_server import StubServer, add_behaviour_args, behaviour_from_args
+from llm.task_generator import TaskGenerator
+from llm.synthetic_tasks import SyntheticTaskGenerator
+from tracing.setup_tracer import tracer
+from opentelemetry import context
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from utils import serialization
+from utils.stats import percentile
+import argparse
+import csv
+import os
+import random
+import threading
+import time
+import urllib.request
+
+
+def arrival_times(num_tasks, rate, poisson=True, seed=None):
+    """Offsets in seconds at which tasks arrive"""
+    rng = random.Random(seed)
+    times, t = [], 0.0
+    for _ in range(num_tasks):
+        times.append(t)
+        t += rng.expovariate(rate) if poisson else 1.0 / rate
+    return times
+
+
+def fetch_stats(base_url):
+    """The stub server's /stats, or None for endpoints without one"""
+    url = base_url.rstrip("/").removesuffix("/v1") + "/stats"
+    try:
+        with urllib.request.urlopen(url, timeout=5) as response:
+            return serialization.loads(response.read())
+    except OSError:
+        return None
+
+
+class LoadTest:
+    def __init__(self, model, task_gen, rate, num_tasks, concurrency=16, poisson=True, seed=None):
+        self.model = model
+        self.task_gen = task_gen
+        self.rate = rate
+        self.num_tasks = num_tasks
+        self.concurrency = concurrency
+        self.poisson = poisson
+        self.seed = seed
+        self.rows = []
+        self.duration = 0.0
+        self._lock = threading.Lock()
+        self._parent_context = None
+
+    def run(self):
+        """Submit tasks on schedule and wait for all of them; returns per-task rows"""
+        self._parent_context = context.get_current()
+        schedule = arrival_times(self.num_tasks, self.rate, self.poisson, self.seed)
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="loadtest") as executor:
+            for i, offset in enumerate(schedule):
+                delay = start + offset - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                executor.submit(self._run_task, i, start + offset)
+        self.duration = time.perf_counter() - start
+        self.rows.sort(key=lambda row: row["task_id"])
+        return self.rows
+
+    def _run_task(self, i, scheduled):
+        started = time.perf_counter()
+        error = ""
+        subtasks = 0
+        with tracer.start_as_current_span(f"MainTask.{i + 1}", context=self._parent_context) as span, \
+                track_fallbacks() as fallbacks:
+            try:
+                task = self.task_gen.generate_task(temperature=0.8)
+                result = self.model.run_task(task)
+                subtasks = len(result.subtask_results)
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+            span.set_attribute("task.fallbacks", len(fallbacks))
+        finished = time.perf_counter()
+        with self._lock:
+            self.rows.append({
+                "task_id": i + 1,
+                "queue_delay": started - scheduled,
+                "service_time": finished - started,
+                "latency": finished - scheduled,
+                "subtasks": subtasks,
+                "fallbacks": len(fallbacks),
+                "fallback_stages": ",".join(fallbacks),
+                "error": error,
+            })
+
+    def summary(self):
+        latencies = sorted(row["latency"] for row in self.rows)
+        failed = sum(1 for row in self.rows if row["error"])
+        degraded = sum(1 for row in self.rows if not row["error"] and row["fallbacks"])
+        completed = len(self.rows) - failed - degraded
+        return {
+            "target_rate": self.rate,
+            "tasks": len(self.rows),
+            "completed": completed,
+            "degraded": degraded,
+            "failed": failed,
+            "llm_give_ups": sum(row["fallbacks"] for row in self.rows),
+            "duration": self.duration,
+            # Only tasks that ran without any fallback count towards throughput
+            "throughput": completed / self.duration if self.duration else 0.0,
+            "latency_p50": percentile(latencies, 0.50),
+            "latency_p95": percentile(latencies, 0.95),
+            "latency_p99": percentile(latencies, 0.99),
+            "avg_queue_delay": sum(row["queue_delay"] for row in self.rows) / len(self.rows) if self.rows else 0.0,
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Drive the simulation at a target rate against an LLM endpoint")
+    parser.add_argument("--rate", type=float, default=2.0, help="Target task arrivals per second")
+    parser.add_argument("--tasks", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=16, help="Tasks in flight at once")
+    parser.add_argument("--uniform", action="store_true", help="Evenly spaced arrivals instead of Poisson")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--base-url", default=None,
+                        help="OpenAI-compatible endpoint to test (default: start a local stub server)")
+    parser.add_argument("--max-retries", type=int, default=2, help="Client retries on 429/5xx")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Client request timeout in seconds")
+    parser.add_argument("--task-source", choices=["llm", "synthetic"], default="llm",
+                        help="Generate task text through the endpoint or offline")
+    parser.add_argument("--planners", type=int, default=1)
+    parser.add_argument("--coders", type=int, default=2)
+    parser.add_argument("--reviewers", type=int, default=1)
+    parser.add_argument("--assignment", default="random", choices=list(ASSIGNMENT_POLICIES))
+    add_behaviour_args(parser)
+    args = parser.parse_args(argv)
+
+    server = None
+    base_url = args.base_url
+    if base_url is None:
+        server = StubServer(behaviour=behaviour_from_args(args)).start()
+        base_url = server.base_url
+        print(f"🧪 Stub server on {base_url}: latency {args.latency}, error rate {args.error_rate:.0%}, "
+              f"rate limit {args.rate_limit or 'none'}")
+    configure_client(base_url=base_url, max_retries=args.max_retries, timeout=args.timeout)
+
+    model = CodeReviewModel(num_coders=args.coders, num_reviewers=args.reviewers, num_planners=args.planners,
+                            assignment=args.assignment)
+    if args.task_source == "synthetic":
+        task_gen = SyntheticTaskGenerator(seed=args.seed)
+    else:
+        task_gen = TaskGenerator()
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    output_dir = f"results/loadtest_{timestamp}"
+    os.makedirs(output_dir, exist_ok=True)
+
+    print(f"🚀 Submitting {args.tasks} tasks at {args.rate:g}/s with up to {args.concurrency} in flight...")
+    with tracer.start_as_current_span("LoadTest") as span:
+        loadtest = LoadTest(model, task_gen, args.rate, args.tasks, args.concurrency,
+                            poisson=not args.uniform, seed=args.seed)
+        rows = loadtest.run()
+        summary = loadtest.summary()
+        stats = server.behaviour.stats() if server is not None else fetch_stats(base_url)
+        if stats is not None:
+            summary["llm_retries"] = stats["retried_requests"]
+            summary["llm"] = stats
+
+        for key, value in summary.items():
+            if key != "llm":
+                span.set_attribute(f"loadtest.{key}", value)
+        if stats is not None:
+            span.set_attribute("loadtest.llm.requests", stats["requests"])
+            span.set_attribute("loadtest.llm.retried_requests", stats["retried_requests"])
+            for status, count in stats["status"].items():
+                span.set_attribute(f"loadtest.llm.status_{status}", count)
+
+    if server is not None:
+        server.stop()
+
+    with open(f"{output_dir}/loadtest_tasks.csv", "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]) if rows else ["task_id"])
+        writer.writeheader()
+        writer.writerows(rows)
+    serialization.dump(summary, f"{output_dir}/loadtest_summary.json")
+
+    print(f"\n📈 {summary['completed']}/{summary['tasks']} tasks completed in {summary['duration']:.1f}s: "
+          f"{summary['throughput']:.2f} tasks/s (target {args.rate:g}/s), "
+          f"{summary['degraded']} degraded by LLM fallbacks, {summary['failed']} failed")
+    print(f"   Task latency p50/p95/p99: {summary['latency_p50']:.2f}/{summary['latency_p95']:.2f}/"
+          f"{summary['latency_p99']:.2f}s   avg queue delay {summary['avg_queue_delay']:.2f}s   "
+          f"LLM retries {summary.get('llm_retries', 'n/a')}, give-ups {summary['llm_give_ups']}")
+    if stats is not None:
+        print(f"   LLM requests: {stats['requests']} ({stats['requests_per_second']:.1f}/s), "
+              f"status {stats['status']}, {stats['retried_requests']} retries")
+        print(f"   LLM latency p50/p95/p99: {stats['latency_p50']:.2f}/{stats['latency_p95']:.2f}/"
+              f"{stats['latency_p99']:.2f}s")
+    print(f"💾 Results saved to {output_dir}")
+
+
+if __name__ == "__main__":
+    main()
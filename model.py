@@ -2,17 +2,34 @@ from agents.coder import CoderAgent
 from agents.reviewer import ReviewerAgent
 from agents.planner import PlannerAgent
 from utils.similarity import SimilarityCalculator
+from utils.ambiguity import AMBIGUOUS_PHRASES
+from assignment import make_policy
+from records import SubtaskResult, TaskResult
+from utils import serialization
+from utils.blob_store import set_text_attribute
 from tracing.setup_tracer import tracer
+from opentelemetry import trace
 import random
-import json
 import time
 import logging
+import threading
 
 logger = logging.getLogger(__name__)
 
 
 class CodeReviewModel:
-    def __init__(self, num_coders=2, num_reviewers=1, num_planners=1):
+    def __init__(self, num_coders=2, num_reviewers=1, num_planners=1, assignment="random",
+                 ambiguity_rate=0.3, bad_code_rate=0.1, rng=None, similarity_calculator=None,
+                 workflow_cache=None, blob_store=None):
+        # A seeded random.Random makes a run reproducible; defaults to the module-level RNG
+        self.rng = rng or random
+        self.ambiguity_rate = ambiguity_rate
+        self.bad_code_rate = bad_code_rate
+        # Optional task -> subtasks map shared across runs to skip repeat planning
+        self.workflow_cache = workflow_cache
+        # Optional BlobStore; spans then carry hashes instead of full task/code text
+        self.blob_store = blob_store
+
         self.next_id = 0
         self.coders = []
         self.reviewers = []
@@ -36,118 +53,149 @@ class CodeReviewModel:
             self.reviewers.append(agent)
             self.next_id += 1
 
-        self.similarity_calculator = SimilarityCalculator()
-        self.ambiguous_phrases = [
-            "using appropriate methods", "with proper implementation",
-            "following best practices", "in a scalable way"
-        ]
+        # How coders and reviewers are picked for each subtask
+        self.assignment = make_policy(assignment, self.rng)
+        self._assign_lock = threading.Lock()
+
+        # Reuse an already loaded embedding model when one is passed in
+        self.similarity_calculator = similarity_calculator or SimilarityCalculator()
+        self.ambiguous_phrases = list(AMBIGUOUS_PHRASES)
 
     def run_task(self, task):
-        with tracer.start_as_current_span("Model.run_task") as span:
-            # Track error sources
-            error_sources = []
-            original_task = task
-
-            # Inject ambiguity (30% chance)
-            is_synthetic_ambiguity = random.random() < 0.3
-            if is_synthetic_ambiguity:
-                task = self._make_ambiguous(task)
-                error_sources.append("synthetic_ambiguity")
-
-            # Detect natural ambiguity
-            is_natural_ambiguity = any(phrase in task for phrase in self.ambiguous_phrases)
-            if is_natural_ambiguity:
-                error_sources.append("natural_ambiguity")
-
-            span.set_attribute("task.original", original_task)
-            span.set_attribute("task.assigned", task)
-            span.set_attribute("task.synthetic_ambiguity", is_synthetic_ambiguity)
-            span.set_attribute("task.natural_ambiguity", is_natural_ambiguity)
-
-            print(f"\nStarting main task: {task}")
-            if is_synthetic_ambiguity or is_natural_ambiguity:
-                print(f"  !! Ambiguous task (sources: {', '.join(error_sources)})")
-
-            # Get planner
-            planner = random.choice(self.planners)
-
-            # Create workflow decomposition
+        with tracer.start_as_current_span("Model.run_task"):
+            plan = self.plan_task(task)
+            return self.execute_plan(plan)
+
+    def plan_task(self, task):
+        """Inject ambiguity and decompose the task (attributes go on the current span)"""
+        span = trace.get_current_span()
+
+        # Track error sources
+        error_sources = []
+        original_task = task
+
+        # Inject ambiguity (30% chance by default)
+        is_synthetic_ambiguity = self.rng.random() < self.ambiguity_rate
+        if is_synthetic_ambiguity:
+            task = self._make_ambiguous(task)
+            error_sources.append("synthetic_ambiguity")
+
+        # Detect natural ambiguity
+        is_natural_ambiguity = any(phrase in task for phrase in self.ambiguous_phrases)
+        if is_natural_ambiguity:
+            error_sources.append("natural_ambiguity")
+
+        set_text_attribute(span, "task.original", original_task, self.blob_store)
+        set_text_attribute(span, "task.assigned", task, self.blob_store)
+        span.set_attribute("task.synthetic_ambiguity", is_synthetic_ambiguity)
+        span.set_attribute("task.natural_ambiguity", is_natural_ambiguity)
+
+        print(f"\nStarting main task: {task}")
+        if is_synthetic_ambiguity or is_natural_ambiguity:
+            print(f"  !! Ambiguous task (sources: {', '.join(error_sources)})")
+
+        # Get planner
+        planner = self.rng.choice(self.planners)
+
+        # Create workflow decomposition
+        if self.workflow_cache is not None and task in self.workflow_cache:
+            subtasks = list(self.workflow_cache[task])
+            span.set_attribute("workflow.cached", True)
+        else:
             subtasks = planner.create_workflow(task)
-            span.set_attribute("workflow.subtasks", json.dumps(subtasks))
-            print(f"Workflow created with {len(subtasks)} subtasks")
-
-            # Execute subtasks
-            subtask_results = []
-            total_similarity = 0
-            total_errors = 0
-
-            for i, subtask in enumerate(subtasks):
-                # Ensure subtask is a string
-                if not isinstance(subtask, str):
-                    subtask = str(subtask)
-                    error_sources.append(f"subtask_{i + 1}_type_conversion")
-
-                with tracer.start_as_current_span(f"Subtask.{i + 1}") as subtask_span:
-                    subtask_span.set_attribute("subtask.description", subtask)
-                    print(f"\nProcessing subtask {i + 1}/{len(subtasks)}: {subtask}")
-
-                    # Get agents for this subtask
-                    coder = random.choice(self.coders)
-                    reviewer = random.choice(self.reviewers)
-
-                    # Generate code
-                    code = coder.step(subtask)
-
-                    # Inject bad code (10% chance)
-                    is_bad_code = random.random() < 0.1
-                    if is_bad_code:
-                        original_code = code
-                        code = self._generate_bad_code()
-                        error_sources.append(f"subtask_{i + 1}_bad_code")
-                        print(f"  !! Bad code injected in subtask {i + 1}")
-
-                    # Calculate similarity for this subtask
-                    similarity = self.similarity_calculator.calculate_similarity(subtask, code)
-                    total_similarity += similarity
-
-                    # Review code
-                    result = reviewer.step(code)
-
-                    # Record subtask results
-                    subtask_results.append({
-                        "subtask": subtask,
-                        "code": code,
-                        "result": result,
-                        "similarity": similarity
-                    })
-
-                    # Add subtask attributes to span
-                    subtask_span.set_attribute("subtask.similarity", float(similarity))
-                    subtask_span.set_attribute("subtask.result", result)
-
-            # Calculate average similarity across subtasks
-            avg_similarity = total_similarity / len(subtasks) if subtasks else 0
-
-            # metrics
-            errors = len(error_sources)
-            span.set_attribute("task_code.avg_similarity", float(avg_similarity))
-            span.set_attribute("task.errors", errors)
-            span.set_attribute("task.error_sources", ",".join(error_sources))
-            span.set_attribute("task.result", "Completed")  # Overall task status
-
-            print(f"\nMain task completed. Avg similarity: {avg_similarity:.2f}, Errors: {errors}")
-            return {
-                "task": task,
-                "original_task": original_task,
-                "workflow": subtasks,
-                "subtask_results": subtask_results,
-                "similarity": avg_similarity,
-                "errors": errors,
-                "error_sources": error_sources
-            }
+            if self.workflow_cache is not None:
+                self.workflow_cache[task] = list(subtasks)
+        span.set_attribute("workflow.subtasks", serialization.dumps(subtasks))
+        print(f"Workflow created with {len(subtasks)} subtasks")
+
+        return {
+            "task": task,
+            "original_task": original_task,
+            "workflow": subtasks,
+            "error_sources": error_sources
+        }
+
+    def execute_plan(self, plan):
+        """Code, score and review each subtask of a planned task (attributes go on the current span)"""
+        span = trace.get_current_span()
+        task = plan["task"]
+        subtasks = plan["workflow"]
+        error_sources = list(plan["error_sources"])
+
+        # Execute subtasks
+        subtask_results = []
+        total_similarity = 0.0
+        total_errors = 0
+
+        for i, subtask in enumerate(subtasks):
+            # Ensure subtask is a string
+            if not isinstance(subtask, str):
+                subtask = str(subtask)
+                error_sources.append(f"subtask_{i + 1}_type_conversion")
+
+            with tracer.start_as_current_span(f"Subtask.{i + 1}") as subtask_span:
+                subtask_span.set_attribute("subtask.description", subtask)
+                print(f"\nProcessing subtask {i + 1}/{len(subtasks)}: {subtask}")
+
+                # Get coder for this subtask
+                coder = self._assign(self.coders)
+
+                # Generate code
+                code = coder.step(subtask)
+
+                # Inject bad code (10% chance by default)
+                is_bad_code = self.rng.random() < self.bad_code_rate
+                if is_bad_code:
+                    original_code = code
+                    code = self._generate_bad_code()
+                    error_sources.append(f"subtask_{i + 1}_bad_code")
+                    print(f"  !! Bad code injected in subtask {i + 1}")
+
+                # Calculate similarity for this subtask
+                similarity = self.similarity_calculator.calculate_similarity(subtask, code)
+                total_similarity += similarity
+
+                # Review code
+                reviewer = self._assign(self.reviewers)
+                result = reviewer.step(code)
+
+                # Record subtask results
+                subtask_results.append(SubtaskResult(subtask, code, result, similarity))
+
+                # Add subtask attributes to span
+                subtask_span.set_attribute("subtask.similarity", similarity)
+                subtask_span.set_attribute("subtask.result", result)
+
+        # Calculate average similarity across subtasks
+        avg_similarity = total_similarity / len(subtasks) if subtasks else 0.0
+
+        # metrics
+        errors = len(error_sources)
+        span.set_attribute("task_code.avg_similarity", avg_similarity)
+        span.set_attribute("task.errors", errors)
+        span.set_attribute("task.error_sources", ",".join(error_sources))
+        span.set_attribute("task.result", "Completed")  # Overall task status
+
+        print(f"\nMain task completed. Avg similarity: {avg_similarity:.2f}, Errors: {errors}")
+        return TaskResult(
+            task=task,
+            original_task=plan["original_task"],
+            workflow=subtasks,
+            subtask_results=subtask_results,
+            similarity=avg_similarity,
+            errors=errors,
+            error_sources=error_sources
+        )
+
+    def _assign(self, agents):
+        """Pick an agent with the assignment policy and count the work against it"""
+        with self._assign_lock:
+            agent = self.assignment.select(agents, lambda a: a.load.outstanding)
+            agent.load.assigned()
+        return agent
 
     def _make_ambiguous(self, task: str) -> str:
-        return f"{task} {random.choice(self.ambiguous_phrases)}"
+        return f"{task} {self.rng.choice(self.ambiguous_phrases)}"
 
     def _generate_bad_code(self) -> str:
         bad_code_examples = [
@@ -157,4 +205,4 @@ class CodeReviewModel:
             "// PLACEHOLDER: Actual code goes here",
             "pass  # To be completed"
         ]
-        return random.choice(bad_code_examples)
\ No newline at end of file
+        return self.rng.choice(bad_code_examples)
\ No newline at end of file
@@ -0,0 +1,231 @@
+from tracing.setup_tracer import tracer
+from opentelemetry import trace, context
+from utils.blob_store import set_text_attribute
+import threading
+import queue
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Sentinel marking the end of a stage's input
+_DONE = object()
+
+
+class Stage:
+    """A pool of worker threads reading from an inbox queue and writing to an outbox queue"""
+
+    def __init__(self, name, func, workers, inbox, outbox=None, memory_budget=None):
+        self.name = name
+        self.func = func
+        self.workers = workers
+        self.inbox = inbox
+        self.outbox = outbox
+        self.memory_budget = memory_budget
+        self.downstream_workers = 0
+
+        self.busy_time = 0.0
+        self.processed = 0
+        self.failed = 0
+        self._alive = workers
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def start(self):
+        for n in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"{self.name}-{n + 1}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def join(self):
+        for thread in self._threads:
+            thread.join()
+
+    def _run(self):
+        while True:
+            item = self.inbox.get()
+            if item is _DONE:
+                break
+
+            started = time.perf_counter()
+            try:
+                output = self.func(item)
+            except Exception:
+                logger.exception(f"Stage {self.name} failed on item {item.get('index')}")
+                output = None
+                with self._lock:
+                    self.failed += 1
+            elapsed = time.perf_counter() - started
+
+            with self._lock:
+                self.busy_time += elapsed
+                self.processed += 1
+            if self.memory_budget is not None:
+                self.memory_budget.sample(self.name)
+
+            if output is not None and self.outbox is not None:
+                self.outbox.put(output)
+
+        # Last worker out tells every downstream worker to stop
+        with self._lock:
+            self._alive -= 1
+            last = self._alive == 0
+        if last and self.outbox is not None:
+            for _ in range(self.downstream_workers):
+                self.outbox.put(_DONE)
+
+
+class TaskPipeline:
+    """Run generation -> planning -> coding/review -> reporting as overlapping stages.
+
+    Stages are connected by bounded queues, so a slow stage applies
+    backpressure to the stages feeding it. Queue depths are sampled while the
+    pipeline runs to show which stage is the bottleneck.
+
+    With a MemoryBudget, task intake is throttled when memory nears the
+    budget and every stage samples memory. Passing tasks/results buffers
+    (e.g. SpillBuffers) collects output in completion order instead of
+    holding it all until the run ends.
+    """
+
+    def __init__(self, model, generate_task, num_tasks, generation_workers=1,
+                 planning_workers=1, coding_workers=1, queue_size=4, sample_interval=0.1,
+                 memory_budget=None, tasks=None, results=None):
+        self.model = model
+        self.generate_task = generate_task
+        self.num_tasks = num_tasks
+        self.sample_interval = sample_interval
+        self.memory_budget = memory_budget
+
+        self.queues = {
+            "generation": queue.Queue(maxsize=queue_size),
+            "planning": queue.Queue(maxsize=queue_size),
+            "coding": queue.Queue(maxsize=queue_size),
+            "reporting": queue.Queue(maxsize=queue_size),
+        }
+        self.stages = [
+            Stage("generation", self._generate, generation_workers,
+                  self.queues["generation"], self.queues["planning"], memory_budget=memory_budget),
+            Stage("planning", self._plan, planning_workers,
+                  self.queues["planning"], self.queues["coding"], memory_budget=memory_budget),
+            Stage("coding", self._code_and_review, coding_workers,
+                  self.queues["coding"], self.queues["reporting"], memory_budget=memory_budget),
+            Stage("reporting", self._report, 1, self.queues["reporting"], memory_budget=memory_budget),
+        ]
+        for upstream, downstream in zip(self.stages, self.stages[1:]):
+            upstream.downstream_workers = downstream.workers
+
+        # Keyed by index, or appended in completion order when buffers are given
+        self.ordered = tasks is None
+        self.tasks = {} if self.ordered else tasks
+        self.results = {} if self.ordered else results
+        self.depth_samples = {name: [] for name in self.queues}
+        self.duration = 0.0
+        self._parent_context = None
+        self._stop_sampling = threading.Event()
+
+    def run(self):
+        """Run all stages to completion; returns (tasks, results) in task order"""
+        # Worker threads don't inherit the caller's span, so pass it explicitly
+        self._parent_context = context.get_current()
+
+        feeder = threading.Thread(target=self._feed, name="pipeline-feeder", daemon=True)
+        sampler = threading.Thread(target=self._sample_depths, name="pipeline-sampler", daemon=True)
+        start_time = time.perf_counter()
+        feeder.start()
+        sampler.start()
+        for stage in self.stages:
+            stage.start()
+        for stage in self.stages:
+            stage.join()
+        self.duration = time.perf_counter() - start_time
+        self._stop_sampling.set()
+        sampler.join()
+        feeder.join()
+
+        if not self.ordered:
+            return self.tasks, self.results
+        order = sorted(self.results)
+        return [self.tasks[i] for i in order], [self.results[i] for i in order]
+
+    def metrics(self):
+        """Per-stage utilization and queue depth statistics"""
+        rows = []
+        for stage in self.stages:
+            samples = self.depth_samples[stage.name]
+            capacity = stage.workers * self.duration
+            rows.append({
+                "stage": stage.name,
+                "workers": stage.workers,
+                "processed": stage.processed,
+                "failed": stage.failed,
+                "busy_time": stage.busy_time,
+                "utilization": stage.busy_time / capacity if capacity else 0,
+                "avg_queue_depth": sum(samples) / len(samples) if samples else 0,
+                "max_queue_depth": max(samples) if samples else 0,
+            })
+        return rows
+
+    def _feed(self):
+        """Admit tasks into the generation queue, holding back while memory is tight"""
+        for i in range(self.num_tasks):
+            if self.memory_budget is not None:
+                self.memory_budget.throttle("intake")
+            self.queues["generation"].put({"index": i})
+        for _ in range(self.stages[0].workers):
+            self.queues["generation"].put(_DONE)
+
+    def _sample_depths(self):
+        while not self._stop_sampling.wait(self.sample_interval):
+            for name, q in self.queues.items():
+                self.depth_samples[name].append(q.qsize())
+
+    def _generate(self, item):
+        with tracer.start_as_current_span("TaskGeneration", context=self._parent_context) as span:
+            task = self.generate_task()
+            set_text_attribute(span, "task.content", task, self.model.blob_store)
+        item["task"] = task
+        return item
+
+    def _plan(self, item):
+        i = item["index"]
+        # The task span stays open across stages and is ended by the coding stage;
+        # planning, queue wait and code/review are separate children under it
+        task_span = tracer.start_span(f"MainTask.{i + 1}", context=self._parent_context)
+        set_text_attribute(task_span, "task.description", item["task"], self.model.blob_store)
+        item["task_span"] = task_span
+
+        try:
+            with tracer.start_as_current_span("Model.plan_task", context=trace.set_span_in_context(task_span)):
+                item["plan"] = self.model.plan_task(item["task"])
+        except Exception:
+            task_span.end()
+            raise
+        item["queued_at"] = time.time_ns()
+        return item
+
+    def _code_and_review(self, item):
+        task_context = trace.set_span_in_context(item["task_span"])
+        try:
+            # From the end of planning until this stage picked the task up, including a blocked put
+            wait_span = tracer.start_span("Pipeline.queue_wait", context=task_context, start_time=item["queued_at"])
+            wait_span.set_attribute("pipeline.queue", "coding")
+            wait_span.end()
+
+            with tracer.start_as_current_span("Model.execute_plan", context=task_context):
+                item["result"] = self.model.execute_plan(item["plan"])
+                item["result"].task_id = item["index"] + 1
+        finally:
+            item["task_span"].end()
+        return item
+
+    def _report(self, item):
+        i = item["index"]
+        if self.ordered:
+            self.tasks[i] = item["task"]
+            self.results[i] = item["result"]
+        else:
+            self.tasks.append(item["task"])
+            self.results.append(item["result"])
+        print(f"📥 Task {i + 1}/{self.num_tasks} reported ({len(self.results)} done)")
+        return None
@@ -0,0 +1,225 @@
+"""Compact result records for tasks and subtasks.
+
+Slotted dataclasses replace the per-subtask dicts run_task used to return:
+no per-instance __dict__, similarities stored as native floats, and review
+outcomes as a shared string enum. Records serialize straight to JSONL lines
+and CSV rows in the same layout the dict-based reports used.
+"""
+from dataclasses import dataclass
+from enum import StrEnum
+from utils import serialization
+
+
+class ReviewResult(StrEnum):
+    """Review outcomes; a StrEnum so values compare and serialize as plain strings"""
+    APPROVED = "Approved"
+    REJECTED = "Rejected"
+
+
+MAIN_TASK_FIELDS = [
+    "task_id", "task", "original_task", "subtask_count", "avg_similarity",
+    "errors", "error_sources", "success_rate"
+]
+
+SUBTASK_FIELDS = [
+    "main_task_id", "subtask_id", "subtask", "result", "similarity", "code_snippet"
+]
+
+# Column layouts when text payloads live in a BlobStore
+MAIN_TASK_REF_FIELDS = [
+    "task_id", "task_ref", "original_task_ref", "subtask_count", "avg_similarity",
+    "errors", "error_sources", "success_rate"
+]
+
+SUBTASK_REF_FIELDS = [
+    "main_task_id", "subtask_id", "subtask", "result", "similarity", "code_ref"
+]
+
+
+def code_snippet(code, length=100):
+    return code[:length] + ('...' if len(code) > length else '')
+
+
+@dataclass(slots=True)
+class SubtaskResult:
+    subtask: str
+    code: str
+    result: ReviewResult
+    similarity: float
+
+    def to_dict(self, store=None):
+        data = {"subtask": self.subtask}
+        if store is None:
+            data["code"] = self.code
+        else:
+            data["code_ref"] = store.put(self.code)
+        data["result"] = str(self.result)
+        data["similarity"] = self.similarity
+        return data
+
+    @classmethod
+    def from_dict(cls, data, store=None):
+        code = data['code'] if store is None else store.resolve(data, 'code')
+        return cls(data['subtask'], code, ReviewResult(data['result']), float(data.get('similarity', 0)))
+
+
+@dataclass(slots=True)
+class TaskResult:
+    task: str
+    original_task: str
+    workflow: list
+    subtask_results: list
+    similarity: float
+    errors: int
+    error_sources: list
+    task_id: int = None
+
+    @property
+    def success_rate(self):
+        if not self.subtask_results:
+            return 0
+        approved = sum(1 for r in self.subtask_results if r.result is ReviewResult.APPROVED)
+        return approved / len(self.subtask_results)
+
+    def to_dict(self, store=None):
+        """Plain dict for JSONL; with a BlobStore, task text and code become *_ref hashes"""
+        if store is None:
+            data = {"task": self.task, "original_task": self.original_task}
+        else:
+            data = {"task_ref": store.put(self.task), "original_task_ref": store.put(self.original_task)}
+        data.update({
+            "workflow": self.workflow,
+            "subtask_results": [r.to_dict(store) for r in self.subtask_results],
+            "similarity": self.similarity,
+            "errors": self.errors,
+            "error_sources": self.error_sources
+        })
+        if self.task_id is not None:
+            data["task_id"] = self.task_id
+        return data
+
+    def to_json(self, store=None):
+        return serialization.dumps(self.to_dict(store))
+
+    @classmethod
+    def from_dict(cls, data, store=None):
+        if store is None:
+            task, original_task = data['task'], data['original_task']
+        else:
+            task, original_task = store.resolve(data, 'task'), store.resolve(data, 'original_task')
+        return cls(
+            task=task,
+            original_task=original_task,
+            workflow=data['workflow'],
+            subtask_results=[SubtaskResult.from_dict(r, store) for r in data['subtask_results']],
+            similarity=float(data['similarity']),
+            errors=data['errors'],
+            error_sources=data['error_sources'],
+            task_id=data.get('task_id')
+        )
+
+    def main_row(self, store=None):
+        """Row for main_task_metrics.csv"""
+        if store is None:
+            text = {"task": self.task, "original_task": self.original_task}
+        else:
+            text = {"task_ref": store.put(self.task), "original_task_ref": store.put(self.original_task)}
+        return {
+            "task_id": self.task_id,
+            **text,
+            "subtask_count": len(self.workflow),
+            "avg_similarity": self.similarity,
+            "errors": self.errors,
+            "error_sources": ", ".join(self.error_sources),
+            "success_rate": self.success_rate
+        }
+
+    def subtask_rows(self, store=None):
+        """Rows for subtask_metrics.csv"""
+        for j, r in enumerate(self.subtask_results):
+            row = {
+                "main_task_id": self.task_id,
+                "subtask_id": j + 1,
+                "subtask": r.subtask,
+                "result": str(r.result),
+                "similarity": r.similarity
+            }
+            if store is None:
+                row["code_snippet"] = code_snippet(r.code)
+            else:
+                row["code_ref"] = store.put(r.code)
+            yield row
+
+
+def _build_dict_results(num_tasks, num_subtasks, similarity_type):
+    """Results shaped like the old run_task output"""
+    results = []
+    for i in range(num_tasks):
+        subtask_results = [{
+            "subtask": f"Subtask {j} for task {i}",
+            "code": f"def subtask_{j}():\n    return {i}",
+            "result": "Approved" if j % 3 else "Rejected",
+            "similarity": similarity_type(0.5 + j / 10)
+        } for j in range(num_subtasks)]
+        results.append({
+            "task": f"Task {i}",
+            "original_task": f"Task {i}",
+            "workflow": [r["subtask"] for r in subtask_results],
+            "subtask_results": subtask_results,
+            "similarity": similarity_type(0.6),
+            "errors": 1,
+            "error_sources": ["synthetic_ambiguity"]
+        })
+    return results
+
+
+def _build_record_results(num_tasks, num_subtasks):
+    results = []
+    for i in range(num_tasks):
+        subtask_results = [SubtaskResult(
+            f"Subtask {j} for task {i}",
+            f"def subtask_{j}():\n    return {i}",
+            ReviewResult.APPROVED if j % 3 else ReviewResult.REJECTED,
+            0.5 + j / 10
+        ) for j in range(num_subtasks)]
+        results.append(TaskResult(
+            task=f"Task {i}",
+            original_task=f"Task {i}",
+            workflow=[r.subtask for r in subtask_results],
+            subtask_results=subtask_results,
+            similarity=0.6,
+            errors=1,
+            error_sources=["synthetic_ambiguity"],
+            task_id=i + 1
+        ))
+    return results
+
+
+def benchmark_memory(num_tasks=100000, num_subtasks=3):
+    """Compare memory held by dict-based results (float32 similarities) against records"""
+    import tracemalloc
+    import numpy as np
+
+    rows = []
+    for label, build in [
+        ("dicts + np.float32", lambda: _build_dict_results(num_tasks, num_subtasks, np.float32)),
+        ("slotted records", lambda: _build_record_results(num_tasks, num_subtasks)),
+    ]:
+        tracemalloc.start()
+        results = build()
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        rows.append((label, current))
+        del results
+
+    print(f"Memory for {num_tasks} tasks x {num_subtasks} subtasks:")
+    baseline = rows[0][1]
+    for label, size in rows:
+        print(f"  {label:<20} {size / 2 ** 20:8.1f} MiB  ({size / baseline:.0%})")
+
+
+if __name__ == "__main__":
+    # Usage: python records.py [num_tasks]
+    import sys
+
+    benchmark_memory(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -1,88 +1,130 @@
 from model import CodeReviewModel
+from pipeline import TaskPipeline
+from assignment import ASSIGNMENT_POLICIES
+from records import TaskResult, MAIN_TASK_FIELDS, SUBTASK_FIELDS, MAIN_TASK_REF_FIELDS, SUBTASK_REF_FIELDS
+from utils import serialization
+from utils.blob_store import BlobStore, set_text_attribute
+from utils.results_store import ResultsWriter, results_path, CODEC_SUFFIXES
+from utils.memory import MemoryBudget, SpillBuffer, parse_size
+from llm.client import configure_client
 from llm.task_generator import TaskGenerator
+from llm.synthetic_tasks import SyntheticTaskGenerator
 import pandas as pd
 from tracing.setup_tracer import tracer
+from tracing.export_config import add_file_exporter
 import time
-import random
-import json
 import os
 from datetime import datetime
 import logging
+import argparse
+import csv
 from opentelemetry import trace
-import numpy as np
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
-def convert_float32(obj):
-    """Recursively convert float32 to Python float for JSON serialization"""
-    if isinstance(obj, np.float32):
-        return float(obj)
-    elif isinstance(obj, dict):
-        return {k: convert_float32(v) for k, v in obj.items()}
-    elif isinstance(obj, list):
-        return [convert_float32(elem) for elem in obj]
-    else:
-        return obj
-
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run the code review multi-agent simulation")
+    parser.add_argument("--tasks", type=int, default=5, help="Number of tasks to generate and run")
+    parser.add_argument("--task-source", choices=["llm", "synthetic"], default="llm",
+                        help="Generate tasks with the LLM or offline from templates")
+    parser.add_argument("--seed", type=int, default=None, help="Seed for synthetic task generation")
+    parser.add_argument("--base-url", default=None,
+                        help="OpenAI-compatible endpoint for LLM calls (e.g. a local llm.stub_server)")
+    parser.add_argument("--inline-text", action="store_true",
+                        help="Keep full task/code text in spans and results instead of blob hashes")
+    parser.add_argument("--results-codec", choices=list(CODEC_SUFFIXES), default="gzip",
+                        help="Block compression for full_results.jsonl (zstd needs the zstandard package)")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="Overlap generation, planning and coding/review in a staged pipeline")
+    parser.add_argument("--generation-workers", type=int, default=1)
+    parser.add_argument("--planning-workers", type=int, default=1)
+    parser.add_argument("--coding-workers", type=int, default=1)
+    parser.add_argument("--queue-size", type=int, default=4, help="Capacity of each inter-stage queue")
+    parser.add_argument("--assignment", default="random", choices=list(ASSIGNMENT_POLICIES),
+                        help="Policy for assigning subtasks to coders and reviewers")
+    parser.add_argument("--planners", type=int, default=1)
+    parser.add_argument("--coders", type=int, default=2)
+    parser.add_argument("--reviewers", type=int, default=1)
+    parser.add_argument("--memory-budget", type=parse_size, default=None,
+                        help="Cap memory (e.g. 512M, 2G): throttle intake and spill results and spans to disk")
+    parser.add_argument("--trace-allocations", action="store_true",
+                        help="With --memory-budget, also record tracemalloc peaks per stage (slows the run)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.base_url:
+        configure_client(base_url=args.base_url)
 
-def main():
     # Initialize Jaeger tracer
     tracer = trace.get_tracer_provider().get_tracer(__name__)
 
-    # Initialize model with planner
-    model = CodeReviewModel(num_coders=2, num_reviewers=1, num_planners=1)
-    task_gen = TaskGenerator()
-
     # Create results directory with timestamp
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     results_dir = f"results/stress_test_{timestamp}"
     os.makedirs(results_dir, exist_ok=True)
 
-    # Generate tasks using LLM
-    num_tasks = 5
-    tasks = []
-    print(f"🔧 Generating {num_tasks} tasks with LLM...")
+    # Store code and task text once; spans and results reference it by hash
+    blob_store = None if args.inline_text else BlobStore(f"{results_dir}/blobs")
+
+    # Initialize model with planner
+    model = CodeReviewModel(num_coders=args.coders, num_reviewers=args.reviewers, num_planners=args.planners,
+                            assignment=args.assignment, blob_store=blob_store)
+    if args.task_source == "synthetic":
+        task_gen = SyntheticTaskGenerator(seed=args.seed)
+    else:
+        task_gen = TaskGenerator()
+
+    num_tasks = args.tasks
+
+    # Under a memory budget, results, tasks and span batches are spilled to disk under pressure
+    memory_budget = tasks = results = None
+    if args.memory_budget:
+        memory_budget = MemoryBudget(args.memory_budget, trace_allocations=args.trace_allocations).start()
+        span_processor = add_file_exporter(f"{results_dir}/spans.jsonl")
+        tasks = SpillBuffer(f"{results_dir}/tasks.spill.jsonl")
+        results = SpillBuffer(f"{results_dir}/results.spill.jsonl",
+                              encode=TaskResult.to_dict, decode=TaskResult.from_dict)
+        memory_budget.on_pressure(tasks.spill)
+        memory_budget.on_pressure(results.spill)
+        memory_budget.on_pressure(span_processor.force_flush)
+        if blob_store is not None:
+            memory_budget.on_pressure(blob_store.get.cache_clear)
+            memory_budget.on_pressure(blob_store.spill_index)
 
     # Create parent span for entire simulation
     with tracer.start_as_current_span("FullSimulation") as sim_span:
         sim_span.set_attribute("task_count", num_tasks)
         sim_span.set_attribute("jaeger.export", True)
+        sim_span.set_attribute("simulation.pipeline", args.pipeline)
+        sim_span.set_attribute("simulation.assignment", args.assignment)
+        sim_span.set_attribute("simulation.task_source", args.task_source)
 
-        # Generate tasks in batches
-        for i in range(num_tasks):
-            with tracer.start_as_current_span("TaskGeneration") as span:
-                task = task_gen.generate_task(temperature=0.8)
-                tasks.append(task)
-                span.set_attribute("task.content", task)
-                if (i + 1) % 10 == 0:
-                    print(f"  Generated task {i + 1}/{num_tasks}")
-                time.sleep(0.5)
-
-        # Save generated tasks
-        with open(f"{results_dir}/tasks.json", "w") as f:
-            json.dump(tasks, f)
-
-        # Run simulation
-        print(f"\n🚀 Starting simulation with {len(tasks)} tasks...")
-        full_results = []
         start_time = time.time()
+        if args.pipeline:
+            tasks, full_results = run_pipeline(model, task_gen, num_tasks, args, results_dir, sim_span,
+                                               memory_budget, tasks, results)
+        else:
+            tasks, full_results = run_sequential(model, task_gen, num_tasks,
+                                                 throttle=args.task_source == "llm",
+                                                 memory_budget=memory_budget, tasks=tasks, results=results)
 
-        for i, task in enumerate(tasks):
-            print(f"\n{'=' * 60}")
-            print(f"🔍 PROCESSING TASK {i + 1}/{len(tasks)}")
-            print(f"{'=' * 60}")
-
-            with tracer.start_as_current_span(f"MainTask.{i + 1}") as task_span:
-                task_span.set_attribute("task.description", task)
-                task_result = model.run_task(task)
-                full_results.append(task_result)
+        # Save generated tasks
+        serialization.dump_array(tasks, f"{results_dir}/tasks.json")
 
         # Generate reports
         print("\n📊 SIMULATION COMPLETE! GENERATING REPORTS...")
-        generate_reports(full_results, results_dir)
+        generate_reports(full_results, results_dir, blob_store, args.results_codec, memory_budget)
+
+        if memory_budget is not None:
+            report_memory(memory_budget, results_dir, sim_span)
+            memory_budget.stop()
+            tasks.close()
+            full_results.close()
 
         # Performance metrics
         duration = time.time() - start_time
@@ -91,55 +133,134 @@ def main():
         print(f"⏱️  AVERAGE TIME PER TASK: {duration / num_tasks:.2f} SECONDS")
 
 
-def generate_reports(full_results, results_dir):
-    # Main task report (CSV)
-    main_report = []
-    for i, task_result in enumerate(full_results):
-        main_report.append({
-            "task_id": i + 1,
-            "task": task_result['task'],
-            "original_task": task_result['original_task'],
-            "subtask_count": len(task_result['workflow']),
-            "avg_similarity": task_result['similarity'],
-            "errors": task_result['errors'],
-            "error_sources": ", ".join(task_result['error_sources']),
-            "success_rate": sum(1 for r in task_result['subtask_results'] if r['result'] == "Approved") /
-                            len(task_result['subtask_results'])
-        })
-
-    df_main = pd.DataFrame(main_report)
-    df_main.to_csv(f"{results_dir}/main_task_metrics.csv", index=False)
-
-    # Subtask-level report (CSV)
-    subtask_report = []
-    for i, task_result in enumerate(full_results):
-        for j, subtask_result in enumerate(task_result['subtask_results']):
-            subtask_report.append({
-                "main_task_id": i + 1,
-                "subtask_id": j + 1,
-                "subtask": subtask_result['subtask'],
-                "result": subtask_result['result'],
-                "similarity": subtask_result.get('similarity', 0),
-                "code_snippet": subtask_result['code'][:100] + ('...' if len(subtask_result['code']) > 100 else '')
-            })
-
-    df_subtasks = pd.DataFrame(subtask_report)
-    df_subtasks.to_csv(f"{results_dir}/subtask_metrics.csv", index=False)
-
-    # Full results in JSONL format (with float conversion)
-    with open(f"{results_dir}/full_results.jsonl", "w") as f:
-        for result in full_results:
-            # Convert float32 to standard float
-            converted_result = convert_float32(result)
-            f.write(json.dumps(converted_result) + "\n")
+def run_sequential(model, task_gen, num_tasks, throttle=True, memory_budget=None, tasks=None, results=None):
+    """Generate every task first, then run each task end to end"""
+    tasks = [] if tasks is None else tasks
+    print(f"🔧 Generating {num_tasks} tasks...")
+
+    # Generate tasks in batches
+    for i in range(num_tasks):
+        if memory_budget is not None:
+            # Nothing runs concurrently to drain memory, so only relieve pressure
+            memory_budget.throttle("intake", wait=False)
+        with tracer.start_as_current_span("TaskGeneration") as span:
+            task = task_gen.generate_task(temperature=0.8)
+            tasks.append(task)
+            set_text_attribute(span, "task.content", task, model.blob_store)
+            if (i + 1) % 10 == 0:
+                print(f"  Generated task {i + 1}/{num_tasks}")
+            # Pace LLM requests; synthetic tasks need no throttling
+            if throttle:
+                time.sleep(0.5)
+
+    # Run simulation
+    print(f"\n🚀 Starting simulation with {len(tasks)} tasks...")
+    full_results = [] if results is None else results
+
+    for i, task in enumerate(tasks):
+        print(f"\n{'=' * 60}")
+        print(f"🔍 PROCESSING TASK {i + 1}/{len(tasks)}")
+        print(f"{'=' * 60}")
+
+        with tracer.start_as_current_span(f"MainTask.{i + 1}") as task_span:
+            set_text_attribute(task_span, "task.description", task, model.blob_store)
+            task_result = model.run_task(task)
+            task_result.task_id = i + 1
+            full_results.append(task_result)
+        if memory_budget is not None:
+            memory_budget.throttle("execution", wait=False)
+
+    return tasks, full_results
+
+
+def run_pipeline(model, task_gen, num_tasks, args, results_dir, sim_span, memory_budget=None,
+                 tasks=None, results=None):
+    """Run generation, planning and coding/review as overlapping pipeline stages"""
+    print(f"\n🚀 Starting pipelined simulation with {num_tasks} tasks...")
+    pipeline = TaskPipeline(
+        model,
+        lambda: task_gen.generate_task(temperature=0.8),
+        num_tasks,
+        generation_workers=args.generation_workers,
+        planning_workers=args.planning_workers,
+        coding_workers=args.coding_workers,
+        queue_size=args.queue_size,
+        memory_budget=memory_budget,
+        tasks=tasks,
+        results=results
+    )
+    tasks, full_results = pipeline.run()
+
+    # Export stage metrics so the bottleneck stage is visible
+    stage_metrics = pipeline.metrics()
+    pd.DataFrame(stage_metrics).to_csv(f"{results_dir}/pipeline_metrics.csv", index=False)
+    for row in stage_metrics:
+        prefix = f"pipeline.{row['stage']}"
+        sim_span.set_attribute(f"{prefix}.workers", row['workers'])
+        sim_span.set_attribute(f"{prefix}.utilization", row['utilization'])
+        sim_span.set_attribute(f"{prefix}.avg_queue_depth", row['avg_queue_depth'])
+        sim_span.set_attribute(f"{prefix}.max_queue_depth", row['max_queue_depth'])
+        print(f"  {row['stage']:<10} utilization={row['utilization']:.0%} "
+              f"avg_queue={row['avg_queue_depth']:.1f} max_queue={row['max_queue_depth']}")
+
+    return tasks, full_results
+
+
+def report_memory(memory_budget, results_dir, sim_span):
+    """Export per-stage peak memory"""
+    memory_budget.annotate(sim_span)
+    rows = memory_budget.metrics()
+    pd.DataFrame(rows).to_csv(f"{results_dir}/memory_metrics.csv", index=False)
+    print(f"\n🧠 Memory budget {memory_budget.limit / 2 ** 20:.0f} MiB: "
+          f"{memory_budget.throttles} throttles ({memory_budget.throttle_time:.1f}s), "
+          f"{memory_budget.reliefs} spills")
+    for row in rows:
+        print(f"  {row['stage']:<10} rss_peak={row['rss_peak_mb']:.0f} MiB "
+              f"traced_peak={row['traced_peak_mb']:.0f} MiB")
+
+
+def generate_reports(full_results, results_dir, blob_store=None, results_codec="gzip", memory_budget=None):
+    """Write CSV, JSONL and validation reports in a single pass over the results"""
+    validation = _new_validation()
+    num_results = 0
+
+    with open(f"{results_dir}/main_task_metrics.csv", "w", newline="") as main_file, \
+            open(f"{results_dir}/subtask_metrics.csv", "w", newline="") as subtask_file, \
+            ResultsWriter(results_path(results_dir, results_codec), results_codec) as results_writer:
+        # Main task and subtask-level reports (CSV)
+        main_writer = csv.DictWriter(
+            main_file, fieldnames=MAIN_TASK_FIELDS if blob_store is None else MAIN_TASK_REF_FIELDS)
+        subtask_writer = csv.DictWriter(
+            subtask_file, fieldnames=SUBTASK_FIELDS if blob_store is None else SUBTASK_REF_FIELDS)
+        main_writer.writeheader()
+        subtask_writer.writeheader()
+
+        for i, task_result in enumerate(full_results):
+            if task_result.task_id is None:
+                task_result.task_id = i + 1
+            main_writer.writerow(task_result.main_row(blob_store))
+            subtask_writer.writerows(task_result.subtask_rows(blob_store))
+
+            # Full results in block-compressed JSONL, indexed by task id
+            results_writer.write(task_result.to_dict(blob_store), task_result.task_id)
+
+            _check_span_coverage(task_result, validation)
+            num_results += 1
+            if memory_budget is not None and num_results % 1000 == 0:
+                memory_budget.sample("reporting")
+
+    if blob_store is not None:
+        blob_store.close()
+        print(f"🗃️  Blob store: {blob_store.stored} distinct payloads for {blob_store.puts} references "
+              f"({blob_store.stored_bytes / 1024:.1f} KiB compressed)")
 
     # Validation report
-    validation_results = validate_span_coverage(full_results)
+    validation_results = _finish_validation(validation, num_results)
     with open(f"{results_dir}/validation_report.txt", "w") as f:
         f.write("SPAN COVERAGE VALIDATION REPORT\n")
         f.write("=" * 50 + "\n")
-        f.write(f"Tasks Processed: {len(full_results)}\n")
-        f.write(f"Tasks With Complete Coverage: {validation_results['complete_coverage']}/{len(full_results)}\n")
+        f.write(f"Tasks Processed: {num_results}\n")
+        f.write(f"Tasks With Complete Coverage: {validation_results['complete_coverage']}/{num_results}\n")
         f.write(f"Coverage Success Rate: {validation_results['coverage_rate']:.1%}\n\n")
         f.write("COMMON MISSING SPANS:\n")
         for span_type, count in validation_results['missing_spans'].most_common(5):
@@ -157,7 +278,9 @@ def generate_reports(full_results, results_dir):
         f.write("3. Search parameters:\n")
         f.write("   - Service: code-review-mas\n")
         f.write("   - Operation: FullSimulation\n")
-        f.write("   - Tags: agent.role OR task.input\n\n")
+        f.write("   - Tags: agent.role OR task.input\n")
+        f.write("   - Attributes ending in .ref hold blob hashes; resolve them with\n")
+        f.write("     BlobStore('<results_dir>/blobs').get(<hash>)\n\n")
         f.write("4. Trace hierarchy example:\n")
         f.write("   FullSimulation (root)\n")
         f.write("   ├── TaskGeneration\n")
@@ -179,37 +302,50 @@ def generate_reports(full_results, results_dir):
     print("📘 Jaeger guide available in jaeger_guide.txt")
 
 
+REQUIRED_SPANS = [
+    "Model.run_task",
+    "Planner.create_workflow",
+    "CoderAgent.step",
+    "ReviewerAgent.step"
+]
+
+
 def validate_span_coverage(full_results):
+    validation = _new_validation()
+    num_results = 0
+    for result in full_results:
+        _check_span_coverage(result, validation)
+        num_results += 1
+    return _finish_validation(validation, num_results)
+
+
+def _new_validation():
     from collections import Counter
-    validation = {
+    return {
         "complete_coverage": 0,
         "missing_spans": Counter(),
         "coverage_rate": 0
     }
 
-    required_spans = [
-        "Model.run_task",
-        "Planner.create_workflow",
-        "CoderAgent.step",
-        "ReviewerAgent.step"
-    ]
 
-    for result in full_results:
-        missing = []
-        for span in required_spans:
-            if not any(span in source for source in result['error_sources']):
-                if span == "Planner.create_workflow" and len(result['workflow']) == 0:
-                    missing.append(span)
-                elif span not in ["Planner.create_workflow"]:
-                    missing.append(span)
-
-        if not missing:
-            validation["complete_coverage"] += 1
-        else:
-            for span in missing:
-                validation["missing_spans"][span] += 1
+def _check_span_coverage(result, validation):
+    missing = []
+    for span in REQUIRED_SPANS:
+        if not any(span in source for source in result.error_sources):
+            if span == "Planner.create_workflow" and len(result.workflow) == 0:
+                missing.append(span)
+            elif span not in ["Planner.create_workflow"]:
+                missing.append(span)
+
+    if not missing:
+        validation["complete_coverage"] += 1
+    else:
+        for span in missing:
+            validation["missing_spans"][span] += 1
+
 
-    validation["coverage_rate"] = validation["complete_coverage"] / len(full_results)
+def _finish_validation(validation, num_results):
+    validation["coverage_rate"] = validation["complete_coverage"] / num_results if num_results else 0
     return validation
 
 
@@ -0,0 +1,187 @@
+"""Parallel parameter sweeps over one shared task corpus.
+
+A sweep spec (JSON) lists values for model parameters; every combination is
+run against the same tasks with its own seeded RNG stream. Worker processes
+load the embedding model once and reuse it for every config they run, and
+workflows are planned once up front so configs only differ by the swept
+parameters. Usage:
+
+    python sweep.py sweep_spec.json --workers 4
+"""
+from model import CodeReviewModel
+from utils.ambiguity import AMBIGUOUS_PHRASES
+from agents.planner import PlannerAgent
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+import contextlib
+import argparse
+import itertools
+import random
+import json
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+# Parameters a sweep may vary, with the values run_simulation.py uses
+DEFAULT_PARAMETERS = {
+    "ambiguity_rate": 0.3,
+    "bad_code_rate": 0.1,
+    "num_coders": 2,
+    "num_reviewers": 1,
+    "num_planners": 1,
+    "assignment": "random",
+}
+
+# State shared by every config a worker process runs
+_worker = {}
+
+
+def load_spec(path):
+    """Load a sweep spec: {"num_tasks", "tasks_file", "base_seed", "repeats", "grid": {param: [values]}}"""
+    with open(path) as f:
+        spec = json.load(f)
+
+    unknown = set(spec.get("grid", {})) - set(DEFAULT_PARAMETERS)
+    if unknown:
+        raise ValueError(f"Unknown sweep parameters: {', '.join(sorted(unknown))}")
+    return spec
+
+
+def expand_grid(spec):
+    """Expand the grid into one config per combination and repeat, each with its own seed"""
+    grid = {name: spec.get("grid", {}).get(name, [default]) for name, default in DEFAULT_PARAMETERS.items()}
+    combinations = list(itertools.product(*grid.values()))
+    repeats = spec.get("repeats", 1)
+
+    # Independent, reproducible RNG streams per config
+    seeds = np.random.SeedSequence(spec.get("base_seed", 42)).spawn(len(combinations) * repeats)
+
+    configs = []
+    for n, (values, repeat) in enumerate(itertools.product(combinations, range(repeats))):
+        configs.append({
+            "config_id": n,
+            "repeat": repeat,
+            "seed": int(seeds[n].generate_state(1)[0]),
+            **dict(zip(grid, values))
+        })
+    return configs
+
+
+def prepare_workflows(tasks, configs, batch_size=8):
+    """Plan every task variant the sweep can produce, once, with batched requests"""
+    variants = list(tasks)
+    if any(config["ambiguity_rate"] > 0 for config in configs):
+        variants += [f"{task} {phrase}" for task in tasks for phrase in AMBIGUOUS_PHRASES]
+
+    planner = PlannerAgent(0, None)
+    planned = planner.create_workflows(variants, batch_size=batch_size)
+    return {variants[i]: subtasks for i, subtasks in planned.items()}
+
+
+def _init_worker(tasks, workflows, quiet):
+    from utils.similarity import SimilarityCalculator
+    _worker["tasks"] = tasks
+    _worker["workflows"] = workflows
+    _worker["similarity"] = SimilarityCalculator()
+    _worker["quiet"] = quiet
+
+
+def _run_config(config):
+    """Run the shared corpus under one config; returns one row per task"""
+    model = CodeReviewModel(
+        num_coders=config["num_coders"],
+        num_reviewers=config["num_reviewers"],
+        num_planners=config["num_planners"],
+        assignment=config["assignment"],
+        ambiguity_rate=config["ambiguity_rate"],
+        bad_code_rate=config["bad_code_rate"],
+        rng=random.Random(config["seed"]),
+        similarity_calculator=_worker["similarity"],
+        workflow_cache=dict(_worker["workflows"])
+    )
+
+    rows = []
+    with open(os.devnull, "w") as devnull, \
+            contextlib.redirect_stdout(devnull if _worker["quiet"] else sys.stdout):
+        for i, task in enumerate(_worker["tasks"]):
+            result = model.run_task(task)
+            result.task_id = i + 1
+            row = result.main_row()
+            # The corpus is shared, so task text lives once in tasks.json
+            del row["task"], row["original_task"]
+            rows.append({**config, **row})
+    return rows
+
+
+def load_tasks(spec):
+    """Use the spec's task file if given, otherwise generate the corpus once (LLM or synthetic)"""
+    if spec.get("tasks_file"):
+        with open(spec["tasks_file"]) as f:
+            tasks = json.load(f)
+        return tasks[:spec["num_tasks"]] if spec.get("num_tasks") else tasks
+
+    num_tasks = spec.get("num_tasks", 5)
+    if spec.get("task_source") == "synthetic":
+        from llm.synthetic_tasks import SyntheticTaskGenerator
+        print(f"🔧 Generating {num_tasks} synthetic tasks...")
+        return list(SyntheticTaskGenerator(seed=spec.get("base_seed", 42)).stream(num_tasks))
+
+    from llm.task_generator import TaskGenerator
+    task_gen = TaskGenerator()
+    print(f"🔧 Generating {num_tasks} tasks with LLM...")
+    return [task_gen.generate_task(temperature=0.8) for _ in range(num_tasks)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a parameter sweep over a shared task corpus")
+    parser.add_argument("spec", help="Path to a JSON sweep spec")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Parallel worker processes")
+    parser.add_argument("--verbose", action="store_true", help="Show per-task agent output and console spans")
+    args = parser.parse_args()
+
+    spec = load_spec(args.spec)
+    configs = expand_grid(spec)
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    results_dir = f"results/sweep_{timestamp}"
+    os.makedirs(results_dir, exist_ok=True)
+
+    tasks = load_tasks(spec)
+    with open(f"{results_dir}/tasks.json", "w") as f:
+        json.dump(tasks, f)
+    with open(f"{results_dir}/sweep_spec.json", "w") as f:
+        json.dump(spec, f, indent=2)
+
+    print(f"🗺️  Planning {len(tasks)} tasks and their ambiguous variants...")
+    workflows = prepare_workflows(tasks, configs, spec.get("plan_batch_size", 8))
+
+    workers = max(1, min(args.workers, len(configs)))
+    print(f"🚀 Running {len(configs)} configs over {len(tasks)} tasks with {workers} worker(s)...")
+    initargs = (tasks, workflows, not args.verbose)
+    if workers == 1:
+        _init_worker(*initargs)
+        config_rows = [_run_config(config) for config in configs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=initargs) as pool:
+            config_rows = list(pool.map(_run_config, configs))
+
+    df = pd.DataFrame([row for rows in config_rows for row in rows])
+    df.to_csv(f"{results_dir}/sweep_results.csv", index=False)
+
+    # One summary row per config
+    keys = ["config_id", "repeat", "seed", *DEFAULT_PARAMETERS]
+    summary = df.groupby(keys, as_index=False).agg(
+        tasks=("task_id", "count"),
+        avg_similarity=("avg_similarity", "mean"),
+        avg_errors=("errors", "mean"),
+        success_rate=("success_rate", "mean")
+    )
+    summary.to_csv(f"{results_dir}/sweep_summary.csv", index=False)
+
+    print(summary.to_string(index=False))
+    print(f"\n💾 Sweep results saved to: {results_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+import os
+
+import pytest
+
+from utils.blob_store import BlobStore
+
+
+def test_put_deduplicates_and_round_trips(tmp_path):
+    store = BlobStore(str(tmp_path / "blobs"))
+    first = store.put("def login(): pass")
+    assert store.put("def login(): pass") == first
+    second = store.put("def pay(): pass")
+
+    assert (store.puts, store.stored) == (3, 2)
+    assert store.get(first) == "def login(): pass"
+    assert store.get(second) == "def pay(): pass"
+    assert store.resolve({"code_ref": second}, "code") == "def pay(): pass"
+    store.close()
+
+    # A fresh store reads the same index back
+    reopened = BlobStore(str(tmp_path / "blobs"))
+    assert first in reopened
+    assert reopened.get(first) == "def login(): pass"
+
+
+def test_spilled_index_still_deduplicates(tmp_path):
+    store = BlobStore(str(tmp_path / "blobs"))
+    digests = [store.put(f"payload {i}") for i in range(100)]
+    store.spill_index()
+    assert not store._index
+    assert os.path.exists(store.spill_path)
+
+    # Payloads stored before the spill are found on disk, not stored again
+    assert [store.put(f"payload {i}") for i in range(100)] == digests
+    assert store.stored == 100
+    new = store.put("payload 100")
+    assert store.stored == 101
+
+    store.get.cache_clear()
+    assert store.get(digests[42]) == "payload 42"
+    assert store.get(new) == "payload 100"
+    with pytest.raises(KeyError):
+        store.get("0" * 32)
+
+    store.close()
+    assert not os.path.exists(store.spill_path)
+    assert store.get(digests[7]) == "payload 7"
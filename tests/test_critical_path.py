@@ -0,0 +1,104 @@
+from analysis.critical_path import SpanTable, analyze, critical_path, load_spans, self_times
+from utils import serialization
+
+MS = 10 ** 6
+
+
+def pipelined_task():
+    """One pipelined task: planning, a long coding-queue wait, then code/review"""
+    table = SpanTable()
+    spans = [
+        # span id, parent, name, start ms, end ms
+        ("root", None, "FullSimulation", 0, 100),
+        ("task", "root", "MainTask.1", 0, 100),
+        ("plan", "task", "Model.plan_task", 0, 20),
+        ("llm", "plan", "Planner.create_workflow", 5, 15),
+        ("queue", "task", "Pipeline.queue_wait", 20, 60),
+        ("exec", "task", "Model.execute_plan", 60, 100),
+        ("sub1", "exec", "Subtask.1", 60, 80),
+        ("sub2", "exec", "Subtask.2", 80, 95),
+    ]
+    for span_id, parent, name, start, end in spans:
+        table.add("t1", span_id, parent, name, start * MS, end * MS)
+    return table.build_index()
+
+
+def by_id(table, values):
+    return {table.span_id[i]: value for i, value in enumerate(values)}
+
+
+def test_index_and_names():
+    table = pipelined_task()
+    assert [table.span_id[i] for i in table.roots] == ["root"]
+    assert [table.span_id[c] for c in table.children(1)] == ["plan", "queue", "exec"]
+    assert table.name[6] == table.name[7] == "Subtask.N"
+
+
+def test_self_times():
+    table = pipelined_task()
+    assert by_id(table, [t // MS for t in self_times(table)]) == {
+        "root": 0, "task": 0, "plan": 10, "llm": 10, "queue": 40, "exec": 5, "sub1": 20, "sub2": 15,
+    }
+
+
+def test_self_time_counts_overlapping_children_once():
+    table = SpanTable()
+    table.add("t", "r", None, "Root", 0, 50 * MS)
+    table.add("t", "a", "r", "A", 0, 30 * MS)
+    table.add("t", "b", "r", "B", 10 * MS, 40 * MS)
+    table.build_index()
+    assert by_id(table, [t // MS for t in self_times(table)]) == {"r": 10, "a": 30, "b": 30}
+
+    # The later-ending child wins, and the earlier one only covers what is left before it
+    path = [(table.span_id[i], s // MS, e // MS) for i, s, e in critical_path(table, 0)]
+    assert path == [("r", 40, 50), ("b", 10, 40), ("a", 0, 10)]
+
+
+def test_critical_path_walks_back_from_the_end():
+    table = pipelined_task()
+    path = [(table.span_id[i], s // MS, e // MS) for i, s, e in critical_path(table, 0)]
+    assert path == [
+        ("exec", 95, 100), ("sub2", 80, 95), ("sub1", 60, 80), ("queue", 20, 60),
+        ("plan", 15, 20), ("llm", 5, 15), ("plan", 0, 5),
+    ]
+
+
+def test_queue_wait_is_classified_as_wait():
+    analysis = analyze(pipelined_task())
+
+    assert analysis["critical_ms"] == 100
+    assert analysis["critical_wait_ms"] == 50  # 40 ms queued + 10 ms in the planner's LLM call
+    assert analysis["wait_ms"] == 50
+    assert analysis["compute_ms"] == 50
+
+    rows = {row["span"]: row for row in analysis["bottlenecks"]}
+    assert rows["Pipeline.queue_wait"]["kind"] == "wait"
+    assert rows["Pipeline.queue_wait"]["critical_share"] == 0.4
+    assert rows["Model.execute_plan"]["kind"] == "compute"
+    assert rows["Subtask.N"]["count"] == 2
+    assert analysis["bottlenecks"][0]["span"] == "Pipeline.queue_wait"
+
+    # One trace-level path and one per MainTask
+    paths = {row["span"]: row for row in analysis["paths"]}
+    assert paths["MainTask.N"]["critical_wait_ms"] == 50
+    assert paths["MainTask.N"]["path"] == ("Model.plan_task > Planner.create_workflow > Model.plan_task > "
+                                           "Pipeline.queue_wait > Subtask.N > Model.execute_plan")
+    assert analysis["folded"]["FullSimulation;MainTask.N;Pipeline.queue_wait"] == 40_000
+
+
+def test_load_sdk_span_export(tmp_path):
+    path = tmp_path / "spans.jsonl"
+    spans = [
+        {"name": "MainTask.3", "context": {"trace_id": "0xabc", "span_id": "0x2"}, "parent_id": "0x1",
+         "start_time": "2024-05-01T12:00:00.100000Z", "end_time": "2024-05-01T12:00:00.400000Z"},
+        {"name": "FullSimulation", "context": {"trace_id": "0xabc", "span_id": "0x1"}, "parent_id": None,
+         "start_time": "2024-05-01T12:00:00.000000Z", "end_time": "2024-05-01T12:00:01.000000Z"},
+    ]
+    serialization.write_lines(str(path), spans)
+
+    table = load_spans(str(path))
+    assert len(table) == 2
+    assert table.name == ["MainTask.N", "FullSimulation"]
+    assert table.parent == [1, -1]
+    assert table.duration(0) == 300 * MS
+    assert self_times(table) == [300 * MS, 700 * MS]
@@ -0,0 +1,90 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("openai")
+pytest.importorskip("opentelemetry.sdk")
+
+from agents.planner import PlannerAgent, TOKENS_PER_WORKFLOW
+
+
+class FakeClient:
+    """Answers chat completions from a script of (content, finish_reason) or a callable"""
+
+    def __init__(self, *replies):
+        self.replies = list(replies)
+        self.calls = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, **kwargs):
+        self.calls.append(kwargs)
+        reply = self.replies.pop(0)
+        if callable(reply):
+            reply = reply(kwargs)
+        if isinstance(reply, Exception):
+            raise reply
+        content, finish_reason = reply
+        message = SimpleNamespace(content=content)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message, finish_reason=finish_reason)])
+
+
+def workflows(*ids):
+    return json.dumps({"workflows": {str(i): [f"step a {i}", f"step b {i}"] for i in ids}}), "stop"
+
+
+def batch_ids(call):
+    prompt = call["messages"][-1]["content"]
+    return [int(line[1:line.index("]")]) for line in prompt.splitlines() if line.startswith("[")]
+
+
+TASKS = ["Build a login page", "Add payment webhooks", "Cache the catalog API", "Export reports to CSV"]
+
+
+def test_all_tasks_planned_in_one_batch():
+    client = FakeClient(workflows(0, 1, 2, 3))
+    planned = PlannerAgent(0, None, llm_client=client).create_workflows(TASKS, batch_size=8)
+
+    assert len(client.calls) == 1
+    assert planned == {i: [f"step a {i}", f"step b {i}"] for i in range(4)}
+
+
+def test_partial_response_replans_missing_tasks():
+    client = FakeClient(workflows(0, 2), workflows(1, 3))
+    planned = PlannerAgent(0, None, llm_client=client).create_workflows(TASKS, batch_size=8)
+
+    assert batch_ids(client.calls[1]) == [1, 3]
+    assert sorted(planned) == [0, 1, 2, 3]
+    assert planned[3] == ["step a 3", "step b 3"]
+
+
+def test_truncated_batch_retries_smaller_with_more_tokens():
+    cut_off = json.dumps({"workflows": {"0": ["step a 0", "step b 0"], "1": ["step"]}})[:-12]
+    client = FakeClient((cut_off, "length"), workflows(0, 1), workflows(2, 3))
+    planned = PlannerAgent(0, None, llm_client=client).create_workflows(TASKS, batch_size=4)
+
+    first, *retries = client.calls
+    assert first["max_tokens"] == TOKENS_PER_WORKFLOW * 4
+    assert [batch_ids(call) for call in retries] == [[0, 1], [2, 3]]
+    assert all(call["max_tokens"] == TOKENS_PER_WORKFLOW * 2 * 2 for call in retries)
+    assert planned[0] == ["step a 0", "step b 0"]
+
+
+def test_malformed_response_falls_back():
+    client = FakeClient(("not json", "stop"), ('{"workflows": []}', "stop"), ('{"workflows": []}', "stop"))
+    planner = PlannerAgent(0, None, llm_client=client)
+    planned = planner.create_workflows(TASKS[:2], batch_size=2, max_retries=1)
+
+    assert [len(batch_ids(call)) for call in client.calls] == [2, 1, 1]
+    assert planned[1] == planner._fallback_workflow(TASKS[1])
+    assert planned[1][0] == "Integrate payment gateway"
+
+
+def test_invalid_entries_are_dropped():
+    content = json.dumps({"workflows": {"0": [], "1": "not a list", "7": ["not requested"]}})
+    client = FakeClient((content, "stop"), workflows(0), workflows(1))
+    planned = PlannerAgent(0, None, llm_client=client).create_workflows(TASKS[:2], batch_size=2)
+
+    # Nothing usable came back, so the retry goes one task per request
+    assert [batch_ids(call) for call in client.calls[1:]] == [[0], [1]]
+    assert sorted(planned) == [0, 1]
@@ -0,0 +1,81 @@
+import gzip
+
+import pytest
+
+from utils import serialization
+from utils.results_store import INDEX_SUFFIX, ResultsReader, ResultsWriter, read_results, results_path
+
+
+def records(n):
+    return [{"task_id": i, "task": f"task {i}", "subtask_results": [{"subtask": f"step {i}"}]}
+            for i in range(1, n + 1)]
+
+
+def write(path, items, block_size=4):
+    with ResultsWriter(str(path), block_size=block_size) as writer:
+        for record in items:
+            writer.write(record, record["task_id"])
+    return str(path)
+
+
+def test_round_trip_and_index(tmp_path):
+    items = records(10)
+    path = write(tmp_path / "full_results.jsonl.gz", items)
+
+    index = serialization.load(path + INDEX_SUFFIX)
+    assert index["count"] == 10
+    assert [count for _, _, count in index["blocks"]] == [4, 4, 2]
+    assert index["task_ids"] == [[1, 2, 3, 4], [5, 6, 7, 8], [9, 10]]
+
+    # Still a valid gzip stream for standard tools
+    with gzip.open(path, "rb") as f:
+        assert list(serialization.iter_lines(f)) == items
+
+    with ResultsReader(path) as reader:
+        assert len(reader) == 10
+        assert list(reader) == items
+        assert reader.get(7) == items[6]
+        assert list(reader.range(3, 6)) == items[2:6]
+        assert list(reader.iter_block(2)) == items[8:]
+        assert reader.split(2) == [range(0, 2), range(2, 3)]
+        assert reader.split(5) == [range(0, 1), range(1, 2), range(2, 3)]
+
+
+def test_results_path():
+    assert results_path("out") == "out/full_results.jsonl.gz"
+    assert results_path("out", "zstd") == "out/full_results.jsonl.zst"
+
+
+def test_empty_file(tmp_path):
+    path = write(tmp_path / "full_results.jsonl.gz", [])
+
+    with ResultsReader(path) as reader:
+        assert len(reader) == 0
+        assert list(reader) == []
+        assert reader.split(4) == []
+        assert list(reader.range(1, 10)) == []
+    assert list(read_results(path)) == []
+    assert list(read_results(path, task_ids=[1])) == []
+
+
+def test_missing_ids_are_skipped_in_every_format(tmp_path):
+    items = records(6)
+    indexed = write(tmp_path / "full_results.jsonl.gz", items)
+    plain = str(tmp_path / "full_results.jsonl")
+    serialization.write_lines(plain, items)
+    unindexed = str(tmp_path / "copy.jsonl.gz")
+    with open(indexed, "rb") as src, open(unindexed, "wb") as dst:
+        dst.write(src.read())
+
+    for path in (indexed, plain, unindexed):
+        assert list(read_results(path, task_ids=[5, 99, 2])) == [items[1], items[4]], path
+        assert list(read_results(path)) == items, path
+
+    with ResultsReader(indexed) as reader:
+        with pytest.raises(KeyError):
+            reader.get(99)
+
+
+def test_unknown_codec(tmp_path):
+    with pytest.raises(ValueError):
+        ResultsWriter(str(tmp_path / "results.jsonl"), codec="lz4")
@@ -0,0 +1,43 @@
+from llm.synthetic_tasks import SyntheticTaskGenerator, KEYWORDS
+from utils.ambiguity import AMBIGUOUS_PHRASES
+
+
+def keywords_in(task):
+    lowered = task.lower()
+    return [k for k in KEYWORDS if k and k in lowered]
+
+
+def test_stream_is_mostly_unique():
+    tasks = list(SyntheticTaskGenerator(seed=42).stream(200_000))
+    assert len(set(tasks)) >= 0.995 * len(tasks)
+
+
+def test_cardinality_floor():
+    assert SyntheticTaskGenerator().cardinality() > 10 ** 9
+    assert SyntheticTaskGenerator(ambiguity_rate=0.1).cardinality() == \
+        SyntheticTaskGenerator().cardinality() * (1 + len(AMBIGUOUS_PHRASES))
+
+
+def test_seeded_streams_repeat():
+    assert list(SyntheticTaskGenerator(seed=7).stream(50)) == list(SyntheticTaskGenerator(seed=7).stream(50))
+
+
+def test_at_most_one_keyword_per_task():
+    for task in SyntheticTaskGenerator(seed=1).stream(20_000):
+        assert len(keywords_in(task)) <= 1, task
+
+
+def test_keyword_weights_are_respected():
+    generator = SyntheticTaskGenerator(seed=3, keyword_weights={"payment": 1.0})
+    assert all(keywords_in(task) == ["payment"] for task in generator.stream(1000))
+
+    generic = SyntheticTaskGenerator(seed=3, keyword_weights={None: 1.0})
+    assert not any(keywords_in(task) for task in generic.stream(1000))
+
+
+def test_ambiguity_rate():
+    tasks = list(SyntheticTaskGenerator(seed=5, ambiguity_rate=0.5).stream(10_000))
+    ambiguous = sum(any(phrase in task for phrase in AMBIGUOUS_PHRASES) for task in tasks)
+    assert 0.45 < ambiguous / len(tasks) < 0.55
+    assert not any(phrase in task for task in SyntheticTaskGenerator(seed=5).stream(10_000)
+                   for phrase in AMBIGUOUS_PHRASES)
@@ -0,0 +1,46 @@
+from opentelemetry import trace
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, SpanExporter, SpanExportResult
+import threading
+
+
+class FileSpanExporter(SpanExporter):
+    """Write finished spans to a JSONL file (one span.to_json() object per line)"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "a")
+        self._lock = threading.Lock()
+
+    def export(self, spans):
+        lines = "".join(span.to_json(indent=None) + "\n" for span in spans)
+        with self._lock:
+            if self._file is None:
+                return SpanExportResult.FAILURE
+            self._file.write(lines)
+            self._file.flush()
+        return SpanExportResult.SUCCESS
+
+    def force_flush(self, timeout_millis=30000):
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+        return True
+
+    def shutdown(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def add_file_exporter(path, max_queue_size=2048):
+    """Also export every span to a JSONL file, batched like the Jaeger exporter.
+
+    Returns the span processor. Flush that rather than the whole provider when
+    only the file batches should be pushed out: a provider-wide flush also
+    waits on the OTLP exporter, which blocks while the collector is down.
+    """
+    processor = BatchSpanProcessor(FileSpanExporter(path), max_queue_size=max_queue_size,
+                                   max_export_batch_size=min(512, max_queue_size))
+    trace.get_tracer_provider().add_span_processor(processor)
+    return processor
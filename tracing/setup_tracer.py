@@ -7,6 +7,17 @@ from opentelemetry.sdk.trace.export import (
 )
 from opentelemetry.sdk.resources import SERVICE_NAME, Resource
 from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter  # NEW
+import sys
+
+
+class _CurrentStdout:
+    """Write to whatever sys.stdout is at the time, so redirect_stdout() also silences span output"""
+
+    def write(self, text):
+        return sys.stdout.write(text)
+
+    def flush(self):
+        sys.stdout.flush()
 
 
 def setup_tracer():
@@ -19,7 +30,8 @@ def setup_tracer():
     provider = TracerProvider(resource=resource)
 
     # Console exporter (for debugging)
-    console_exporter = ConsoleSpanExporter()
+    # ConsoleSpanExporter() would bind the sys.stdout of import time
+    console_exporter = ConsoleSpanExporter(out=_CurrentStdout())
     provider.add_span_processor(SimpleSpanProcessor(console_exporter))
 
     # Jaeger OTLP exporter (NEW)
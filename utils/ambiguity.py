@@ -0,0 +1,5 @@
+# Vague phrases that mark a task as ambiguous (injected by the model, stripped before embedding)
+AMBIGUOUS_PHRASES = [
+    "using appropriate methods", "with proper implementation",
+    "following best practices", "in a scalable way"
+]
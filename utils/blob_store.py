@@ -0,0 +1,158 @@
+"""Content-addressed store for large text payloads (generated code, task text).
+
+Each distinct text is compressed once and appended to a single pack file,
+with a sidecar index mapping its hash to an (offset, length) slice. Spans
+and result records carry only the hash; readers resolve hashes lazily and
+cache what they have already decompressed.
+
+The writer's dedup index grows by one entry per distinct payload. Under
+memory pressure spill_index() moves it to an on-disk SQLite table, and
+later lookups check memory first, then the table.
+"""
+from functools import lru_cache
+import hashlib
+import sqlite3
+import threading
+import zlib
+import os
+
+PACK_FILE = "blobs.pack"
+INDEX_FILE = "blobs.idx"
+# Dedup index entries spilled under memory pressure; removed on close
+SPILL_FILE = "blobs.spill.db"
+
+
+class BlobStore:
+    def __init__(self, root, cache_size=4096):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self.pack_path = os.path.join(root, PACK_FILE)
+        self.index_path = os.path.join(root, INDEX_FILE)
+        self.spill_path = os.path.join(root, SPILL_FILE)
+
+        self._index = None  # hash -> (offset, length), loaded on first use
+        self._spilled = None  # SQLite connection once the index has been spilled
+        self._pack = None
+        self._index_file = None
+        self._lock = threading.Lock()
+        self.get = lru_cache(maxsize=cache_size)(self._read)
+
+        self.puts = 0
+        self.stored = 0
+        self.stored_bytes = 0
+
+    @classmethod
+    def for_results(cls, results_path):
+        """The store next to a results file or inside a results directory"""
+        directory = results_path if os.path.isdir(results_path) else os.path.dirname(results_path)
+        return cls(os.path.join(directory, "blobs"))
+
+    def put(self, text: str) -> str:
+        """Store text (once) and return its hash"""
+        data = text.encode()
+        digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+        with self._lock:
+            self.puts += 1
+            if self._lookup(digest) is None:
+                blob = zlib.compress(data)
+                pack = self._open_writers()
+                offset = pack.tell()
+                pack.write(blob)
+                self._index_file.write(f"{digest} {offset} {len(blob)}\n")
+                self._index[digest] = (offset, len(blob))
+                self.stored += 1
+                self.stored_bytes += len(blob)
+        return digest
+
+    def __contains__(self, digest):
+        with self._lock:
+            return self._lookup(digest) is not None
+
+    def resolve(self, record, key):
+        """Return record[key], or the blob behind record[key + '_ref']"""
+        if key in record:
+            return record[key]
+        ref = record.get(f"{key}_ref")
+        return self.get(ref) if ref is not None else None
+
+    def flush(self):
+        with self._lock:
+            if self._pack is not None:
+                self._pack.flush()
+                self._index_file.flush()
+
+    def spill_index(self):
+        """Move the in-memory dedup index to disk (a memory-pressure hook)"""
+        with self._lock:
+            if not self._index:
+                return
+            if self._spilled is None:
+                self._spilled = sqlite3.connect(self.spill_path, check_same_thread=False)
+                self._spilled.execute("PRAGMA journal_mode = OFF")
+                self._spilled.execute("PRAGMA synchronous = OFF")
+                self._spilled.execute("CREATE TABLE IF NOT EXISTS blobs "
+                                      "(digest TEXT PRIMARY KEY, offset INTEGER, length INTEGER)")
+            self._spilled.executemany("INSERT OR IGNORE INTO blobs VALUES (?, ?, ?)",
+                                      ((d, o, n) for d, (o, n) in self._index.items()))
+            self._spilled.commit()
+            self._index = {}
+
+    def close(self):
+        with self._lock:
+            if self._pack is not None:
+                self._pack.close()
+                self._index_file.close()
+                self._pack = None
+                self._index_file = None
+            if self._spilled is not None:
+                self._spilled.close()
+                self._spilled = None
+                os.remove(self.spill_path)
+                self._index = None  # reloaded from the index file if the store is used again
+
+    def _read(self, digest):
+        self.flush()
+        with self._lock:
+            entry = self._lookup(digest)
+        if entry is None:
+            raise KeyError(digest)
+        offset, length = entry
+        with open(self.pack_path, "rb") as f:
+            f.seek(offset)
+            return zlib.decompress(f.read(length)).decode()
+
+    def _lookup(self, digest):
+        """(offset, length) of a stored blob, or None; call with the lock held"""
+        entry = self._load_index().get(digest)
+        if entry is None and self._spilled is not None:
+            entry = self._spilled.execute("SELECT offset, length FROM blobs WHERE digest = ?",
+                                          (digest,)).fetchone()
+        return entry
+
+    def _load_index(self):
+        if self._index is None:
+            self._index = {}
+            if os.path.exists(self.index_path):
+                with open(self.index_path) as f:
+                    for line in f:
+                        digest, offset, length = line.split()
+                        self._index[digest] = (int(offset), int(length))
+        return self._index
+
+    def _open_writers(self):
+        if self._pack is None:
+            self._pack = open(self.pack_path, "ab")
+            self._pack.seek(0, os.SEEK_END)
+            self._index_file = open(self.index_path, "a")
+        return self._pack
+
+
+def set_text_attribute(span, key, text, store=None, max_inline=None):
+    """Set a text attribute, or only its blob hash (as key.ref) when a store is in use.
+
+    max_inline truncates the inline text; the blob always holds all of it.
+    """
+    if store is None:
+        span.set_attribute(key, text if max_inline is None else text[:max_inline])
+    else:
+        span.set_attribute(f"{key}.ref", store.put(text))
@@ -0,0 +1,245 @@
+"""Memory budgets for long runs: sampling, backpressure and spill-to-disk.
+
+MemoryBudget samples process RSS (psutil when installed, /proc otherwise)
+per stage, plus tracemalloc peaks when trace_allocations is set. Tracing
+every allocation roughly doubles CPU time, so it is off by default, and
+throttling decisions use RSS alone. When RSS nears the budget, intake is
+throttled and registered relief hooks run: buffered results and tasks are
+spilled to disk, span batches are flushed and the garbage collector is run.
+SpillBuffer is the list-like buffer those hooks spill.
+"""
+try:
+    import psutil
+except ImportError:  # optional; /proc is read instead
+    psutil = None
+from utils import serialization
+import gc
+import itertools
+import logging
+import os
+import threading
+import time
+import tracemalloc
+
+logger = logging.getLogger(__name__)
+
+MIB = 2 ** 20
+SIZE_UNITS = {"K": 2 ** 10, "M": 2 ** 20, "G": 2 ** 30}
+# Consecutive throttles that fail to get under the high-water mark before waiting stops
+FUTILE_THROTTLES = 10
+# Ceiling for the relief interval once relief has stopped helping
+MAX_RELIEF_INTERVAL = 60.0
+
+
+def parse_size(size):
+    """Parse a byte count such as '512M', '2G' or '1048576'"""
+    size = str(size).strip().upper().removesuffix("B").removesuffix("I")
+    if size and size[-1] in SIZE_UNITS:
+        return int(float(size[:-1]) * SIZE_UNITS[size[-1]])
+    return int(size)
+
+
+_process = psutil.Process() if psutil is not None else None
+
+
+def rss_bytes():
+    """Resident set size of this process"""
+    if _process is not None:
+        return _process.memory_info().rss
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        import resource
+        # Peak rather than current RSS, in KiB on Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class MemoryBudget:
+    """Track memory per stage and apply backpressure near a byte budget"""
+
+    def __init__(self, limit, high_water=0.85, trace_allocations=False, max_wait=2.0, poll_interval=0.05,
+                 relief_interval=0.5):
+        self.limit = limit
+        self.high_water = int(limit * high_water)
+        self.trace_allocations = trace_allocations
+        self.max_wait = max_wait
+        self.poll_interval = poll_interval
+        self.relief_interval = relief_interval
+
+        self.stages = {}  # stage -> {"samples", "rss_peak", "traced_peak"}
+        self.throttles = 0
+        self.throttle_time = 0.0
+        self.reliefs = 0
+        self._relief_hooks = []
+        self._lock = threading.Lock()
+        self._relief_lock = threading.Lock()
+        self._started_tracing = False
+        self._last_relief = float("-inf")
+        self._futile = 0
+
+    def start(self):
+        if self.trace_allocations and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        return self
+
+    def stop(self):
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def on_pressure(self, hook):
+        """Register a callable run (in registration order) when memory nears the budget"""
+        self._relief_hooks.append(hook)
+
+    def sample(self, stage):
+        """Record RSS and traced memory for a stage; returns the RSS"""
+        rss = rss_bytes()
+        traced = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else 0
+        with self._lock:
+            stats = self.stages.setdefault(stage, {"samples": 0, "rss_peak": 0, "traced_peak": 0})
+            stats["samples"] += 1
+            stats["rss_peak"] = max(stats["rss_peak"], rss)
+            stats["traced_peak"] = max(stats["traced_peak"], traced)
+        return rss
+
+    def throttle(self, stage, wait=True):
+        """Block intake while RSS is above the high-water mark.
+
+        Relief hooks run first; with wait=True the caller then waits (up to
+        max_wait) for downstream stages to drain. Freed memory is not always
+        returned to the OS, so intake resumes after max_wait regardless, and
+        after FUTILE_THROTTLES waits in a row that never got under the mark
+        the budget stops waiting and relieves pressure less and less often.
+        """
+        if self.sample(stage) < self.high_water:
+            self._futile = 0
+            return
+        started = time.perf_counter()
+        self.relieve()
+        deadline = started + (self.max_wait if wait and self._futile < FUTILE_THROTTLES else 0)
+        while (rss := self.sample(stage)) >= self.high_water and time.perf_counter() < deadline:
+            time.sleep(self.poll_interval)
+        with self._lock:
+            self.throttles += 1
+            self.throttle_time += time.perf_counter() - started
+            if rss < self.high_water:
+                self._futile = 0
+            else:
+                self._futile += 1
+                if self._futile == FUTILE_THROTTLES:
+                    logger.warning(f"RSS stays above {self.high_water / MIB:.0f} MiB after spilling; "
+                                   f"the memory budget may be too small for this run")
+
+    def relieve(self):
+        """Run the relief hooks and collect garbage (one caller at a time, rate-limited)"""
+        if not self._relief_lock.acquire(blocking=False):
+            return  # another stage is already relieving pressure
+        try:
+            if time.perf_counter() - self._last_relief < self._relief_interval():
+                return
+            self._last_relief = time.perf_counter()
+            for hook in self._relief_hooks:
+                try:
+                    hook()
+                except Exception:
+                    logger.exception("Memory relief hook failed")
+            gc.collect()
+            self.reliefs += 1
+        finally:
+            self._relief_lock.release()
+
+    def _relief_interval(self):
+        # Past FUTILE_THROTTLES, double the interval per futile throttle so relief that
+        # frees nothing stops stalling intake; it resets once RSS gets under the mark
+        excess = self._futile - FUTILE_THROTTLES
+        if excess < 0:
+            return self.relief_interval
+        return min(MAX_RELIEF_INTERVAL, self.relief_interval * 2 ** min(excess + 1, 16))
+
+    def metrics(self):
+        """Per-stage peak memory rows"""
+        with self._lock:
+            return [{
+                "stage": stage,
+                "samples": stats["samples"],
+                "rss_peak_mb": stats["rss_peak"] / MIB,
+                "traced_peak_mb": stats["traced_peak"] / MIB,
+            } for stage, stats in self.stages.items()]
+
+    def annotate(self, span):
+        """Record the budget and per-stage memory as span attributes"""
+        span.set_attribute("memory.budget_mb", self.limit / MIB)
+        span.set_attribute("memory.throttles", self.throttles)
+        span.set_attribute("memory.throttle_seconds", self.throttle_time)
+        span.set_attribute("memory.reliefs", self.reliefs)
+        for row in self.metrics():
+            prefix = f"memory.{row['stage']}"
+            span.set_attribute(f"{prefix}.rss_peak_mb", row["rss_peak_mb"])
+            span.set_attribute(f"{prefix}.traced_peak_mb", row["traced_peak_mb"])
+
+
+class SpillBuffer:
+    """Append-only buffer that moves its items to a JSONL file when told to (or when full).
+
+    Iterating spills whatever is still in memory and reads the file back, so
+    items come back in the order they were appended.
+    """
+
+    def __init__(self, path, encode=None, decode=None, max_items=1000):
+        self.path = path
+        self.encode = encode
+        self.decode = decode
+        self.max_items = max_items
+        self.spilled = 0
+        self._items = []
+        self._file = None
+        self._writer = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self.spilled + len(self._items)
+
+    def append(self, item):
+        with self._lock:
+            self._items.append(item)
+            if len(self._items) >= self.max_items:
+                self._spill()
+
+    def spill(self):
+        with self._lock:
+            self._spill()
+
+    def __iter__(self):
+        # Spill the remainder so a pressure spill during iteration can't reorder items
+        with self._lock:
+            self._spill()
+            count = self.spilled
+        if count:
+            for data in itertools.islice(serialization.read_lines(self.path), count):
+                yield self.decode(data) if self.decode else data
+
+    def close(self):
+        """Drop buffered items and remove the spill file"""
+        with self._lock:
+            self._items = []
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+                self._writer = None
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+    def _spill(self):
+        if not self._items:
+            return
+        if self._writer is None:
+            self._file = open(self.path, "wb")
+            self._writer = serialization.JsonLineWriter(self._file)
+        for item in self._items:
+            self._writer.write(self.encode(item) if self.encode else item)
+        self._writer.flush()
+        self._file.flush()
+        self.spilled += len(self._items)
+        self._items = []
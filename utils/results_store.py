@@ -0,0 +1,211 @@
+"""Block-compressed JSONL results with a random-access offset index.
+
+Results are written in blocks of lines; each block is compressed on its own
+(a gzip member or a zstd frame) and appended to the file, so the file is
+still a valid .gz/.zst stream for standard tools. A sidecar index records
+every block's byte offset and length plus the task ids it holds. Readers
+memory-map the file and decompress only the blocks they need, which lets
+tools seek straight to one task and lets parallel readers split the work by
+block.
+"""
+try:
+    import zstandard
+except ImportError:  # optional codec
+    zstandard = None
+from functools import lru_cache
+from utils import serialization
+import gzip
+import mmap
+import os
+
+INDEX_SUFFIX = ".idx"
+CODEC_SUFFIXES = {"gzip": ".gz", "zstd": ".zst"}
+
+
+def results_path(directory, codec="gzip"):
+    return os.path.join(directory, f"full_results.jsonl{CODEC_SUFFIXES[codec]}")
+
+
+def _compressor(codec):
+    if codec == "gzip":
+        return lambda data: gzip.compress(data, compresslevel=6)
+    if codec == "zstd":
+        if zstandard is None:
+            raise ValueError("zstd results need the 'zstandard' package")
+        return zstandard.ZstdCompressor(level=3).compress
+    raise ValueError(f"Unknown results codec {codec!r}")
+
+
+def _decompressor(codec):
+    if codec == "gzip":
+        return gzip.decompress
+    if codec == "zstd":
+        if zstandard is None:
+            raise ValueError("zstd results need the 'zstandard' package")
+        return zstandard.ZstdDecompressor().decompress
+    raise ValueError(f"Unknown results codec {codec!r}")
+
+
+class ResultsWriter:
+    """Append records to a block-compressed JSONL file and write its index on close"""
+
+    def __init__(self, path, codec="gzip", block_size=256):
+        self.path = path
+        self.codec = codec
+        self.block_size = block_size
+        self._compress = _compressor(codec)
+        self._file = open(path, "wb")
+        self._lines = []
+        self._task_ids = []
+        self.blocks = []    # [offset, length, count]
+        self.task_ids = []  # task ids per block
+        self.count = 0
+
+    def write(self, record, task_id=None):
+        self._lines.append(serialization.dumps_bytes(record))
+        self._task_ids.append(task_id if task_id is not None else self.count + 1)
+        self.count += 1
+        if len(self._lines) >= self.block_size:
+            self.flush()
+
+    def flush(self):
+        """Compress and append the pending block"""
+        if not self._lines:
+            return
+        block = self._compress(b"\n".join(self._lines) + b"\n")
+        offset = self._file.tell()
+        self._file.write(block)
+        self.blocks.append([offset, len(block), len(self._lines)])
+        self.task_ids.append(self._task_ids)
+        self._lines = []
+        self._task_ids = []
+
+    def close(self):
+        self.flush()
+        self._file.close()
+        serialization.dump({
+            "codec": self.codec,
+            "count": self.count,
+            "blocks": self.blocks,
+            "task_ids": self.task_ids
+        }, self.path + INDEX_SUFFIX)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ResultsReader:
+    """Random access to a block-compressed results file through its index"""
+
+    def __init__(self, path, cache_blocks=8):
+        self.path = path
+        index = serialization.load(path + INDEX_SUFFIX)
+        self.codec = index["codec"]
+        self.count = index["count"]
+        self.blocks = index["blocks"]
+        self._decompress = _decompressor(self.codec)
+
+        # task id -> (block number, line within block)
+        self.positions = {}
+        for block, ids in enumerate(index["task_ids"]):
+            for line, task_id in enumerate(ids):
+                self.positions[task_id] = (block, line)
+
+        self._file = open(path, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        self.block_lines = lru_cache(maxsize=cache_blocks)(self._block_lines)
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        for block in range(len(self.blocks)):
+            yield from self.iter_block(block)
+
+    def get(self, task_id):
+        """The record for one task id"""
+        block, line = self.positions[task_id]
+        return serialization.loads(self.block_lines(block)[line])
+
+    def range(self, first_id, last_id):
+        """Records with first_id <= task_id <= last_id, in file order"""
+        return self._records(t for t in self.positions if first_id <= t <= last_id)
+
+    def select(self, task_ids):
+        """Records for the given task ids, in file order; unknown ids are skipped"""
+        return self._records(t for t in set(task_ids) if t in self.positions)
+
+    def _records(self, task_ids):
+        for block, line in sorted(self.positions[t] for t in task_ids):
+            yield serialization.loads(self.block_lines(block)[line])
+
+    def iter_block(self, block):
+        for line in self.block_lines(block):
+            yield serialization.loads(line)
+
+    def split(self, parts):
+        """Divide blocks into contiguous ranges for parallel readers"""
+        n = len(self.blocks)
+        step = max(1, -(-n // parts) if parts else n)
+        return [range(start, min(start + step, n)) for start in range(0, n, step)]
+
+    def _block_lines(self, block):
+        offset, length, _ = self.blocks[block]
+        return self._decompress(self._map[offset:offset + length]).split(b"\n")[:-1]
+
+    def close(self):
+        if isinstance(self._map, mmap.mmap):
+            self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_results(path, task_ids=None):
+    """Iterate result records from plain JSONL or a block-compressed results file.
+
+    With task_ids, only those records are returned, in file order, and ids
+    not in the file are skipped; an indexed file seeks to them directly
+    instead of scanning.
+    """
+    if os.path.exists(path + INDEX_SUFFIX):
+        with ResultsReader(path) as reader:
+            yield from reader if task_ids is None else reader.select(task_ids)
+        return
+
+    if path.endswith(".gz"):
+        # Concatenated gzip members without an index still decode as one stream
+        with gzip.open(path, "rb") as f:
+            records = serialization.iter_lines(f)
+            yield from records if task_ids is None else _select(records, task_ids)
+    else:
+        records = serialization.read_lines(path)
+        yield from records if task_ids is None else _select(records, task_ids)
+
+
+def _select(records, task_ids):
+    wanted = set(task_ids)
+    return (r for r in records if r.get("task_id") in wanted)
+
+
+if __name__ == "__main__":
+    # Usage: python -m utils.results_store <full_results.jsonl.gz> <task_id> [last_task_id]
+    import sys
+
+    if len(sys.argv) not in (3, 4):
+        print("Usage: python -m utils.results_store <full_results.jsonl.gz> <task_id> [last_task_id]")
+        sys.exit(1)
+
+    first = int(sys.argv[2])
+    last = int(sys.argv[3]) if len(sys.argv) == 4 else first
+    with ResultsReader(sys.argv[1]) as reader:
+        for record in reader.range(first, last):
+            print(serialization.dumps(record))
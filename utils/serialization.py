@@ -0,0 +1,173 @@
+"""JSON serialization for results, tasks and span payloads.
+
+Uses orjson when it is installed: it serializes NumPy scalars and arrays
+natively and is several times faster than the stdlib. Without it, the stdlib
+json module is used with a hook that converts NumPy values, so callers never
+need to pre-convert results.
+"""
+try:
+    import orjson
+except ImportError:  # optional speedup
+    orjson = None
+import json
+
+# Lines buffered before each write in the bulk helpers
+CHUNK_SIZE = 1000
+# Bytes read per chunk when decoding line-delimited files
+READ_SIZE = 1 << 20
+
+
+def _default(obj):
+    """Convert values the encoder does not handle natively"""
+    if hasattr(obj, "tolist"):  # NumPy scalars and arrays
+        return obj.tolist()
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+if orjson is not None:
+    _OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+    def dumps_bytes(obj) -> bytes:
+        return orjson.dumps(obj, default=_default, option=_OPTIONS)
+
+    def dumps(obj) -> str:
+        return orjson.dumps(obj, default=_default, option=_OPTIONS).decode()
+
+    loads = orjson.loads
+else:
+    _encoder = json.JSONEncoder(default=_default)
+
+    def dumps(obj) -> str:
+        return _encoder.encode(obj)
+
+    def dumps_bytes(obj) -> bytes:
+        return _encoder.encode(obj).encode()
+
+    loads = json.loads
+
+
+class JsonLineWriter:
+    """Buffered JSONL writer for a file opened in binary mode"""
+
+    def __init__(self, f, chunk_size=CHUNK_SIZE):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.count = 0
+        self._buffer = []
+
+    def write(self, obj):
+        self._buffer.append(dumps_bytes(obj))
+        self.count += 1
+        if len(self._buffer) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        if self._buffer:
+            self.f.write(b"\n".join(self._buffer) + b"\n")
+            self._buffer = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.flush()
+
+
+def write_lines(path, objects, chunk_size=CHUNK_SIZE):
+    """Write objects to a JSONL file; returns the number of lines written"""
+    with open(path, "wb") as f, JsonLineWriter(f, chunk_size) as writer:
+        for obj in objects:
+            writer.write(obj)
+    return writer.count
+
+
+def iter_lines(f, read_size=READ_SIZE):
+    """Decode a binary JSONL stream in large chunks, yielding one object per line"""
+    remainder = b""
+    while True:
+        chunk = f.read(read_size)
+        if not chunk:
+            break
+        lines = (remainder + chunk).split(b"\n")
+        remainder = lines.pop()
+        for line in lines:
+            if line.strip():
+                yield loads(line)
+    if remainder.strip():
+        yield loads(remainder)
+
+
+def read_lines(path):
+    """Lazily read every object in a JSONL file"""
+    with open(path, "rb") as f:
+        yield from iter_lines(f)
+
+
+def dump(obj, path):
+    with open(path, "wb") as f:
+        f.write(dumps_bytes(obj))
+
+
+def dump_array(items, path, chunk_size=CHUNK_SIZE):
+    """Write an iterable as a JSON array without materializing it as a list"""
+    with open(path, "wb") as f:
+        f.write(b"[")
+        chunk = []
+        first = True
+        for item in items:
+            chunk.append(dumps_bytes(item))
+            if len(chunk) >= chunk_size:
+                f.write((b"" if first else b",") + b",".join(chunk))
+                first = False
+                chunk = []
+        if chunk:
+            f.write((b"" if first else b",") + b",".join(chunk))
+        f.write(b"]")
+
+
+def load(path):
+    with open(path, "rb") as f:
+        return loads(f.read())
+
+
+if __name__ == "__main__":
+    # Usage: python -m utils.serialization [num_records]
+    import os
+    import sys
+    import tempfile
+    import time
+
+    num_records = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    record = {
+        "task": "Implement JWT-based authentication with refresh tokens",
+        "workflow": ["Design auth flow", "Implement core logic", "Add security safeguards"],
+        "subtask_results": [
+            {"subtask": "Design auth flow", "code": "def authenticate_user(username, password):\n    return True",
+             "result": "Approved", "similarity": 0.4123}
+        ] * 3,
+        "similarity": 0.4123,
+        "errors": 1,
+        "error_sources": ["synthetic_ambiguity"]
+    }
+    path = os.path.join(tempfile.mkdtemp(), "bench.jsonl")
+    print(f"Backend: {'orjson' if orjson is not None else 'stdlib json'}; {num_records} records")
+
+    start = time.perf_counter()
+    with open(path, "w") as f:
+        for _ in range(num_records):
+            f.write(json.dumps(record) + "\n")
+    with open(path) as f:
+        for line in f:
+            json.loads(line)
+    baseline = time.perf_counter() - start
+    print(f"  per-line stdlib json: {baseline:.2f}s")
+
+    start = time.perf_counter()
+    write_lines(path, (record for _ in range(num_records)))
+    for _ in read_lines(path):
+        pass
+    duration = time.perf_counter() - start
+    print(f"  bulk serialization:   {duration:.2f}s ({baseline / duration:.1f}x)")
+    os.remove(path)
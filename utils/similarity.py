@@ -1,5 +1,6 @@
 from sentence_transformers import SentenceTransformer
 from sklearn.metrics.pairwise import cosine_similarity
+from utils.ambiguity import AMBIGUOUS_PHRASES
 import re
 
 
@@ -7,20 +8,27 @@ class SimilarityCalculator:
     def __init__(self):
         self.model = SentenceTransformer('all-MiniLM-L6-v2')
 
-    def calculate_similarity(self, task: str, code: str) -> float:
-        # Preprocess code - remove comments and special characters
+    @staticmethod
+    def clean_code(code: str) -> str:
+        """Remove comments and collapse whitespace"""
         clean_code = re.sub(r'#.*|\/\/.*|\/\*.*?\*\/', '', code, flags=re.DOTALL)
-        clean_code = re.sub(r'\s+', ' ', clean_code).strip()
+        return re.sub(r'\s+', ' ', clean_code).strip()
 
-        # Preprocess task - remove ambiguity markers
+    @staticmethod
+    def clean_task(task: str) -> str:
+        """Remove ambiguity markers and collapse whitespace"""
         clean_task = task
-        for phrase in [
-            "using appropriate methods", "with proper implementation",
-            "following best practices", "in a scalable way"
-        ]:
+        for phrase in AMBIGUOUS_PHRASES:
             clean_task = clean_task.replace(phrase, '')
-        clean_task = re.sub(r'\s+', ' ', clean_task).strip()
+        return re.sub(r'\s+', ' ', clean_task).strip()
+
+    def embed(self, texts, batch_size=256):
+        """Unit-length float32 embeddings, one row per text"""
+        return self.model.encode(list(texts), batch_size=batch_size, normalize_embeddings=True,
+                                 convert_to_numpy=True)
 
+    def calculate_similarity(self, task: str, code: str) -> float:
         # Calculate embeddings
-        embeddings = self.model.encode([clean_task, clean_code])
-        return max(0, cosine_similarity([embeddings[0]], [embeddings[1]])[0][0])
\ No newline at end of file
+        embeddings = self.model.encode([self.clean_task(task), self.clean_code(code)])
+        # Native float so results don't carry NumPy scalars
+        return max(0.0, float(cosine_similarity([embeddings[0]], [embeddings[1]])[0][0]))
\ No newline at end of file
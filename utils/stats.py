@@ -0,0 +1,5 @@
+def percentile(sorted_values, q):
+    """Nearest-rank q-quantile (0 <= q <= 1) of an already sorted sequence; 0.0 when empty"""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
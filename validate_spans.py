@@ -1,4 +1,4 @@
-import json
+from utils.results_store import read_results
 import pandas as pd
 from collections import defaultdict
 
@@ -10,13 +10,11 @@ def analyze_coverage(results_file):
         "present": 0
     })
 
-    with open(results_file) as f:
-        for line in f:
-            task = json.loads(line)
-            for span_type in task["span_coverage"]:
-                coverage_stats[span_type]["total"] += 1
-                if task["span_coverage"][span_type]:
-                    coverage_stats[span_type]["present"] += 1
+    for task in read_results(results_file):
+        for span_type in task["span_coverage"]:
+            coverage_stats[span_type]["total"] += 1
+            if task["span_coverage"][span_type]:
+                coverage_stats[span_type]["present"] += 1
 
     # Calculate coverage rates
     report = []
@@ -33,11 +31,11 @@ def analyze_coverage(results_file):
 
 
 if __name__ == "__main__":
-    # Usage: python validate_spans.py results/full_results.jsonl
+    # Usage: python validate_spans.py results/full_results.jsonl.gz
     import sys
 
     if len(sys.argv) != 2:
-        print("Usage: python validate_spans.py <results_file.jsonl>")
+        print("Usage: python validate_spans.py <full_results.jsonl[.gz]>")
         sys.exit(1)
 
     df = analyze_coverage(sys.argv[1])